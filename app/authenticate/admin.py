@@ -1,5 +1,7 @@
 from django.contrib import admin
 from authenticate.models import User, Company, Storage, Employee
+from inventory.models import StorageProduct
+from inventory.services import sync_on_hand
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -18,11 +20,21 @@ class CompanyAdmin(admin.ModelAdmin):
 
 @admin.register(Storage)
 class StorageAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'company', 'capacity', 'created_at')
+    list_display = ('id', 'name', 'company', 'capacity', 'used_units', 'created_at')
     list_display_links = ('id', 'name')
     list_filter = ('company', 'created_at')
     search_fields = ('name', 'address', 'company__name')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('used_units', 'created_at', 'updated_at')
+
+    def delete_model(self, request, obj):
+        product_ids = list(obj.storage_products.values_list('product_id', flat=True))
+        super().delete_model(request, obj)
+        sync_on_hand(product_ids)
+
+    def delete_queryset(self, request, queryset):
+        product_ids = list(StorageProduct.objects.filter(storage__in=queryset).values_list('product_id', flat=True))
+        super().delete_queryset(request, queryset)
+        sync_on_hand(product_ids)
 
 @admin.register(Employee)
 class EmployeeAdmin(admin.ModelAdmin):
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0002_company_inn'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='company',
+            name='inn',
+            field=models.CharField(blank=True, max_length=12, null=True, unique=True, verbose_name='ИНН'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:00
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_used_units(apps, schema_editor):
+    Storage = apps.get_model('authenticate', 'Storage')
+    StorageProduct = apps.get_model('inventory', 'StorageProduct')
+
+    totals = StorageProduct.objects.filter(storage_id=OuterRef('pk')).values('storage_id').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    Storage.objects.update(used_units=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0003_alter_company_inn'),
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storage',
+            name='used_units',
+            field=models.PositiveIntegerField(default=0, verbose_name='Занято единиц'),
+        ),
+        migrations.RunPython(backfill_used_units, migrations.RunPython.noop),
+    ]
@@ -77,12 +77,24 @@ class Storage(models.Model):
     name = models.CharField(max_length=255, verbose_name='Название склада')
     address = models.TextField(verbose_name='Адрес')
     capacity = models.PositiveIntegerField(verbose_name='Вместимость')
+    used_units = models.PositiveIntegerField(default=0, verbose_name='Занято единиц')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return f"{self.name} - {self.company.name}"
 
+    @property
+    def free_units(self):
+        return max(self.capacity - self.used_units, 0)
+
+    @property
+    def utilization(self):
+        """Заполненность склада в процентах."""
+        if not self.capacity:
+            return 0
+        return round(self.used_units * 100 / self.capacity, 1)
+
     class Meta:
         verbose_name = 'Склад'
         verbose_name_plural = 'Склады'
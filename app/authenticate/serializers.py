@@ -45,10 +45,20 @@ class CompanySerializer(serializers.ModelSerializer):
         read_only_fields = ('owner', 'created_at', 'updated_at')
 
 class StorageSerializer(serializers.ModelSerializer):
+    free_units = serializers.IntegerField(read_only=True)
+    utilization = serializers.FloatField(read_only=True)
+
     class Meta:
         model = Storage
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at')
+        read_only_fields = ('used_units', 'created_at', 'updated_at')
+
+    def validate_capacity(self, value):
+        if self.instance and value < self.instance.used_units:
+            raise serializers.ValidationError(
+                f"Вместимость не может быть меньше занятого места ({self.instance.used_units})"
+            )
+        return value
 
 class EmployeeSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(source='user.email', read_only=True)
@@ -1,6 +1,7 @@
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
+from django.db import transaction
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 from .models import User, Company, Storage
 from .serializers import (
@@ -10,6 +11,7 @@ from .serializers import (
     StorageSerializer,
     CompanyCreateSerializer
 )
+from inventory.services import sync_on_hand
 
 class UserRegistrationView(APIView):
     permission_classes = [permissions.AllowAny]
@@ -229,7 +231,10 @@ class StorageDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        storage.delete()
+        with transaction.atomic():
+            product_ids = list(storage.storage_products.values_list('product_id', flat=True))
+            storage.delete()
+            sync_on_hand(product_ids)
         return Response({'detail': 'Склад удален'}, status=status.HTTP_204_NO_CONTENT)
 
 
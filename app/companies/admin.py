@@ -1,9 +1,16 @@
 from django.contrib import admin
-from companies.models import Supplier
+from companies.models import Supplier, SupplierStats
 
 @admin.register(Supplier)
 class SupplierAdmin(admin.ModelAdmin):
     list_display = ('id', 'name', 'inn', 'company', 'created_at')
     list_filter = ('company',)
     search_fields = ('name', 'inn', 'contact_info')
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(SupplierStats)
+class SupplierStatsAdmin(admin.ModelAdmin):
+    list_display = ('supplier', 'company', 'supply_count', 'line_count', 'units', 'spend', 'last_delivery_at')
+    list_filter = ('company',)
+    search_fields = ('supplier__name',)
+    readonly_fields = ('updated_at',)
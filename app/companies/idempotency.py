@@ -0,0 +1,86 @@
+import hashlib
+import json
+from functools import wraps
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+def request_hash(request):
+    """SHA-256 разобранного тела запроса (ключи отсортированы, порядок полей не важен)."""
+    payload = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def idempotent(view_method):
+    """
+    Повтор запроса с тем же заголовком Idempotency-Key возвращает сохраненный
+    ответ, не вызывая обработчик (и не изменяя остатки) повторно.
+
+    Ставится под @transaction.atomic: ключ сохраняется в транзакции запроса,
+    поэтому параллельный дубль откатывается целиком. Ключ, повторенный
+    с другим путем или телом запроса, отклоняется с 422.
+    """
+    @wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key or not hasattr(request.user, 'owned_company'):
+            return view_method(self, request, *args, **kwargs)
+
+        if len(key) > 255:
+            return Response(
+                {'detail': 'Ключ идемпотентности не может быть длиннее 255 символов'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        company = request.user.owned_company
+        now = timezone.now()
+        IdempotencyKey.objects.filter(company=company, key=key, expires_at__lte=now).delete()
+
+        body_hash = request_hash(request)
+        record = IdempotencyKey.objects.filter(company=company, key=key).first()
+        if record:
+            # Пустой хеш — ключ сохранен до появления request_hash, сравнивается только путь
+            if record.request_path != request.path or (record.request_hash and record.request_hash != body_hash):
+                return Response(
+                    {'detail': 'Ключ идемпотентности уже использован для другого запроса'},
+                    status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                )
+            response = Response(record.response_body, status=record.response_status)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        response = view_method(self, request, *args, **kwargs)
+        if not status.is_success(response.status_code):
+            return response
+
+        ttl = getattr(settings, 'IDEMPOTENCY_KEY_TTL', timedelta(hours=24))
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    company=company,
+                    key=key,
+                    request_path=request.path,
+                    request_hash=body_hash,
+                    response_status=response.status_code,
+                    response_body=response.data,
+                    expires_at=now + ttl
+                )
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом завершился первым
+            transaction.set_rollback(True)
+            return Response(
+                {'detail': 'Запрос с этим ключом идемпотентности уже выполнен'},
+                status=status.HTTP_409_CONFLICT
+            )
+
+        return response
+
+    return wrapper
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from companies.models import IdempotencyKey
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ключи идемпотентности с истекшим сроком действия'
+
+    def handle(self, *args, **options):
+        deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Удалено ключей: {deleted}'))
@@ -0,0 +1,68 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Max, Min, Sum
+
+from companies.models import SupplierStats
+from inventory.models import Supply, SupplyProduct
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает показатели поставщиков (SupplierStats) по поставкам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='ID компании (по умолчанию — все)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        supplies = Supply.objects.all()
+        supply_products = SupplyProduct.objects.all()
+        stats = SupplierStats.objects.all()
+        if options['company']:
+            supplies = supplies.filter(company_id=options['company'])
+            supply_products = supply_products.filter(supply__company_id=options['company'])
+            stats = stats.filter(company_id=options['company'])
+
+        lines = {
+            row['supplier_ref']: row
+            for row in supply_products.values(supplier_ref=F('supply__supplier_id')).annotate(
+                total_lines=Count('id'),
+                total_units=Sum('quantity'),
+                total_spend=Sum(ExpressionWrapper(
+                    F('quantity') * F('purchase_price'),
+                    output_field=DecimalField(max_digits=14, decimal_places=2)
+                ))
+            ).order_by()
+        }
+
+        aggregates = supplies.values('supplier_id', 'company_id').annotate(
+            total_supplies=Count('id'),
+            first_delivery=Min('delivery_date'),
+            last_delivery=Max('delivery_date')
+        ).order_by()
+
+        created = 0
+        with transaction.atomic():
+            stats.delete()
+
+            batch = []
+            for row in aggregates.iterator(chunk_size=options['batch_size']):
+                line_totals = lines.get(row['supplier_id'], {})
+                batch.append(SupplierStats(
+                    supplier_id=row['supplier_id'],
+                    company_id=row['company_id'],
+                    supply_count=row['total_supplies'],
+                    line_count=line_totals.get('total_lines') or 0,
+                    units=line_totals.get('total_units') or 0,
+                    spend=line_totals.get('total_spend') or 0,
+                    first_delivery_at=row['first_delivery'],
+                    last_delivery_at=row['last_delivery']
+                ))
+                if len(batch) >= options['batch_size']:
+                    SupplierStats.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+
+            SupplierStats.objects.bulk_create(batch)
+            created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано поставщиков: {created}'))
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:44
+
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0003_alter_company_inn'),
+        ('companies', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdempotencyKey',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=255, verbose_name='Ключ идемпотентности')),
+                ('request_path', models.CharField(max_length=255, verbose_name='Путь запроса')),
+                ('response_status', models.PositiveSmallIntegerField(verbose_name='Статус ответа')),
+                ('response_body', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Тело ответа')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Действует до')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='idempotency_keys', to='authenticate.company', verbose_name='Компания')),
+            ],
+            options={
+                'verbose_name': 'Ключ идемпотентности',
+                'verbose_name_plural': 'Ключи идемпотентности',
+                'unique_together': {('company', 'key')},
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0004_storage_used_units'),
+        ('companies', '0002_idempotencykey'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SupplierStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('supply_count', models.PositiveIntegerField(default=0, verbose_name='Поставок')),
+                ('line_count', models.PositiveIntegerField(default=0, verbose_name='Строк поставок')),
+                ('units', models.PositiveBigIntegerField(default=0, verbose_name='Единиц товара')),
+                ('spend', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Сумма закупок')),
+                ('first_delivery_at', models.DateTimeField(blank=True, null=True, verbose_name='Первая поставка')),
+                ('last_delivery_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя поставка')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='supplier_stats', to='authenticate.company', verbose_name='Компания')),
+                ('supplier', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='stats', to='companies.supplier', verbose_name='Поставщик')),
+            ],
+            options={
+                'verbose_name': 'Показатели поставщика',
+                'verbose_name_plural': 'Показатели поставщиков',
+                'indexes': [models.Index(fields=['company', '-spend'], name='supplierstats_spend_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('companies', '0003_supplier_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='request_hash',
+            field=models.CharField(blank=True, default='', max_length=64, verbose_name='Хеш тела запроса'),
+        ),
+    ]
@@ -1,3 +1,4 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 from authenticate.models import Company
 
@@ -20,4 +21,71 @@ class Supplier(models.Model):
     class Meta:
         verbose_name = 'Поставщик'
         verbose_name_plural = 'Поставщики'
-        unique_together = ('company', 'inn')
\ No newline at end of file
+        unique_together = ('company', 'inn')
+
+class IdempotencyKey(models.Model):
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='idempotency_keys',
+        verbose_name='Компания'
+    )
+    key = models.CharField(max_length=255, verbose_name='Ключ идемпотентности')
+    request_path = models.CharField(max_length=255, verbose_name='Путь запроса')
+    request_hash = models.CharField(max_length=64, blank=True, default='', verbose_name='Хеш тела запроса')
+    response_status = models.PositiveSmallIntegerField(verbose_name='Статус ответа')
+    response_body = models.JSONField(encoder=DjangoJSONEncoder, verbose_name='Тело ответа')
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True, verbose_name='Действует до')
+
+    def __str__(self):
+        return f"{self.key} - {self.request_path}"
+
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        unique_together = ('company', 'key')
+
+
+class SupplierStats(models.Model):
+    """
+    Накопленные показатели поставщика: обновляются при каждой поставке,
+    пересчитываются командой rebuild_supplier_stats.
+    """
+    supplier = models.OneToOneField(
+        Supplier,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Поставщик'
+    )
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='supplier_stats',
+        verbose_name='Компания'
+    )
+    supply_count = models.PositiveIntegerField(default=0, verbose_name='Поставок')
+    line_count = models.PositiveIntegerField(default=0, verbose_name='Строк поставок')
+    units = models.PositiveBigIntegerField(default=0, verbose_name='Единиц товара')
+    spend = models.DecimalField(max_digits=14, decimal_places=2, default=0, verbose_name='Сумма закупок')
+    first_delivery_at = models.DateTimeField(null=True, blank=True, verbose_name='Первая поставка')
+    last_delivery_at = models.DateTimeField(null=True, blank=True, verbose_name='Последняя поставка')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.supplier.name}: {self.supply_count} поставок на {self.spend}"
+
+    @property
+    def average_interval_days(self):
+        """Средний интервал между поставками в днях (None, пока поставок меньше двух)."""
+        if self.supply_count < 2 or not self.first_delivery_at or not self.last_delivery_at:
+            return None
+        span = self.last_delivery_at - self.first_delivery_at
+        return round(span.total_seconds() / 86400 / (self.supply_count - 1), 1)
+
+    class Meta:
+        verbose_name = 'Показатели поставщика'
+        verbose_name_plural = 'Показатели поставщиков'
+        indexes = [
+            models.Index(fields=['company', '-spend'], name='supplierstats_spend_idx'),
+        ]
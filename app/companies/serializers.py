@@ -1,8 +1,25 @@
 from rest_framework import serializers
-from .models import Supplier
+from .models import Supplier, SupplierStats
 
 class SupplierSerializer(serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
-        read_only_fields = ('company', 'created_at', 'updated_at')
\ No newline at end of file
+        read_only_fields = ('company', 'created_at', 'updated_at')
+
+class SupplierStatsSerializer(serializers.ModelSerializer):
+    supplier_name = serializers.CharField(source='supplier.name', read_only=True)
+    average_interval_days = serializers.FloatField(read_only=True, allow_null=True)
+    average_units_per_supply = serializers.SerializerMethodField()
+
+    class Meta:
+        model = SupplierStats
+        fields = (
+            'supplier', 'supplier_name', 'supply_count', 'line_count', 'units', 'spend',
+            'first_delivery_at', 'last_delivery_at', 'average_interval_days', 'average_units_per_supply'
+        )
+
+    def get_average_units_per_supply(self, obj) -> float:
+        if not obj.supply_count:
+            return 0
+        return round(obj.units / obj.supply_count, 1)
@@ -0,0 +1,29 @@
+from .models import SupplierStats
+
+
+def record_supply(supply, supply_products):
+    """
+    Добавляет поставку (с уже посчитанной total_amount) к показателям ее поставщика.
+
+    Строка показателей создается при первой поставке и блокируется
+    select_for_update, поэтому параллельные поставки не теряют приращений.
+    """
+    SupplierStats.objects.bulk_create(
+        [SupplierStats(supplier_id=supply.supplier_id, company_id=supply.company_id)],
+        ignore_conflicts=True
+    )
+    stats = SupplierStats.objects.select_for_update().get(supplier_id=supply.supplier_id)
+
+    stats.supply_count += 1
+    stats.line_count += len(supply_products)
+    stats.units += sum(supply_product.quantity for supply_product in supply_products)
+    stats.spend += supply.total_amount
+    if stats.first_delivery_at is None or supply.delivery_date < stats.first_delivery_at:
+        stats.first_delivery_at = supply.delivery_date
+    if stats.last_delivery_at is None or supply.delivery_date > stats.last_delivery_at:
+        stats.last_delivery_at = supply.delivery_date
+
+    stats.save(update_fields=[
+        'supply_count', 'line_count', 'units', 'spend', 'first_delivery_at', 'last_delivery_at', 'updated_at'
+    ])
+    return stats
@@ -2,8 +2,11 @@ from django.test import TestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
-from authenticate.models import User, Company
-from companies.models import Supplier
+from django.core.management import call_command
+from io import StringIO
+from authenticate.models import User, Company, Storage
+from companies.models import Supplier, SupplierStats
+from inventory.models import Product
 
 class SupplierTests(APITestCase):
     def setUp(self):
@@ -20,4 +23,59 @@ class SupplierTests(APITestCase):
         }
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Supplier.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(Supplier.objects.count(), 1)
+
+class SupplierStatsTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='stats@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company', inn='1234567890')
+        self.storage = Storage.objects.create(company=self.company, name='Склад', address='Адрес', capacity=1000)
+        self.supplier = Supplier.objects.create(company=self.company, name='Основной', inn='0987654321')
+        self.other = Supplier.objects.create(company=self.company, name='Резервный', inn='1111111111')
+        self.product = Product.objects.create(
+            company=self.company, name='Товар', purchase_price='10.50', sale_price='20.00'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def supply(self, supplier, delivery_date, quantity):
+        response = self.client.post(reverse('supplies'), {
+            'supplier_id': supplier.id,
+            'delivery_date': delivery_date,
+            'products': [{'product_id': self.product.id, 'quantity': quantity, 'storage_id': self.storage.id}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_stats_are_updated_on_supply_and_match_rebuild(self):
+        self.supply(self.supplier, '2025-09-01T10:00:00Z', 4)
+        self.supply(self.supplier, '2025-09-11T10:00:00Z', 6)
+        self.supply(self.other, '2025-09-05T10:00:00Z', 1)
+
+        response = self.client.get(reverse('supplier-stats', args=[self.supplier.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['supply_count'], 2)
+        self.assertEqual(response.data['units'], 10)
+        self.assertEqual(response.data['spend'], '105.00')
+        self.assertEqual(response.data['average_interval_days'], 10.0)
+        self.assertEqual(response.data['average_units_per_supply'], 5.0)
+
+        response = self.client.get(reverse('supplier-ranking'), {'order_by': 'units'})
+        self.assertEqual([row['supplier'] for row in response.data['results']], [self.supplier.id, self.other.id])
+
+        before = list(SupplierStats.objects.order_by('supplier_id').values(
+            'supplier_id', 'supply_count', 'line_count', 'units', 'spend', 'first_delivery_at', 'last_delivery_at'
+        ))
+        SupplierStats.objects.update(units=0, spend=0)
+        call_command('rebuild_supplier_stats', stdout=StringIO())
+        after = list(SupplierStats.objects.order_by('supplier_id').values(
+            'supplier_id', 'supply_count', 'line_count', 'units', 'spend', 'first_delivery_at', 'last_delivery_at'
+        ))
+        self.assertEqual(after, before)
+
+    def test_stats_without_supplies_are_empty(self):
+        response = self.client.get(reverse('supplier-stats', args=[self.other.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['supply_count'], 0)
+        self.assertIsNone(response.data['average_interval_days'])
+
+        response = self.client.get(reverse('supplier-ranking'), {'order_by': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import SupplierView, SupplierDetailView, CompanyEmployeeView
+from .views import SupplierView, SupplierDetailView, SupplierStatsView, SupplierRankingView, CompanyEmployeeView
 
 urlpatterns = [
     path('suppliers/', SupplierView.as_view(), name='suppliers'),
+    path('suppliers/ranking/', SupplierRankingView.as_view(), name='supplier-ranking'),
     path('suppliers/<int:pk>/', SupplierDetailView.as_view(), name='supplier-detail'),
+    path('suppliers/<int:pk>/stats/', SupplierStatsView.as_view(), name='supplier-stats'),
     path('employees/', CompanyEmployeeView.as_view(), name='company-employees'),
     path('employees/<int:user_id>/', CompanyEmployeeView.as_view(), name='company-employee-detail'),
 ]
\ No newline at end of file
@@ -1,8 +1,9 @@
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from .models import Supplier
-from .serializers import SupplierSerializer
+from drf_spectacular.utils import extend_schema, OpenApiParameter
+from .models import Supplier, SupplierStats
+from .serializers import SupplierSerializer, SupplierStatsSerializer
 from authenticate.permissions import IsCompanyMember, IsCompanyOwner
 from authenticate.models import User, Employee
 from authenticate.serializers import CompanyEmployeeSerializer
@@ -84,6 +85,75 @@ class SupplierDetailView(APIView):
         return Response({'detail': 'Поставщик удален'}, status=status.HTTP_204_NO_CONTENT)
 
 
+class SupplierStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(responses={200: SupplierStatsSerializer})
+    def get(self, request, pk):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        supplier = Supplier.objects.filter(pk=pk, company=request.user.owned_company).first()
+        if not supplier:
+            return Response(
+                {'detail': 'Поставщик не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        # Показатели читаются из сводной таблицы, без GROUP BY по поставкам
+        stats = SupplierStats.objects.filter(supplier=supplier).first()
+        if stats is None:
+            stats = SupplierStats(supplier=supplier, company=supplier.company)
+        return Response(SupplierStatsSerializer(stats).data)
+
+
+class SupplierRankingView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    orderings = ('spend', 'units', 'supply_count', 'line_count', 'last_delivery_at')
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='order_by',
+                description='Показатель для рейтинга: spend, units, supply_count, line_count или last_delivery_at',
+                type=str
+            ),
+            OpenApiParameter(name='limit', description='Число поставщиков (до 100)', type=int),
+        ],
+        responses={200: SupplierStatsSerializer(many=True)}
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        order_by = request.GET.get('order_by', 'spend')
+        if order_by not in self.orderings:
+            return Response(
+                {'detail': f'order_by должен быть одним из: {", ".join(self.orderings)}'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'limit должен быть числом'}, status=status.HTTP_400_BAD_REQUEST)
+
+        ranking = SupplierStats.objects.select_related('supplier').filter(
+            company=request.user.owned_company
+        ).order_by(f'-{order_by}', 'supplier_id')[:limit]
+
+        return Response({
+            'order_by': order_by,
+            'results': SupplierStatsSerializer(ranking, many=True).data
+        })
+
+
 class CompanyEmployeeView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyOwner]
 
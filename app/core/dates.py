@@ -0,0 +1,46 @@
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+
+def date_range_bounds(start_date=None, end_date=None, tz=None):
+    """
+    Переводит даты YYYY-MM-DD в полуоткрытый интервал [начало, конец) datetime.
+
+    В отличие от __date__gte/__date__lte, фильтр по таким границам не
+    оборачивает колонку в приведение к дате и может использовать индекс.
+    Границы считаются в часовом поясе tz (по умолчанию — текущем).
+    """
+    tz = tz or timezone.get_current_timezone()
+    bounds = []
+    for value, shift in ((start_date, 0), (end_date, 1)):
+        if not value:
+            bounds.append(None)
+            continue
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Некорректная дата: {value}')
+        bounds.append(timezone.make_aware(datetime.combine(day + timedelta(days=shift), time.min), tz))
+    return tuple(bounds)
+
+
+def parse_moment(value, tz=None):
+    """
+    Разбирает момент времени: ISO 8601 datetime или дату YYYY-MM-DD (начало дня).
+
+    Время без часового пояса считается в tz (по умолчанию — текущем).
+    """
+    tz = tz or timezone.get_current_timezone()
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            moment = datetime.combine(day, time.min) if day else None
+    except ValueError:
+        moment = None
+    if moment is None:
+        raise ValueError(f'Некорректная дата: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment, tz)
+    return moment
@@ -0,0 +1,78 @@
+import base64
+import binascii
+import json
+from datetime import date, datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+def encode_cursor(values):
+    payload = [value.isoformat() if isinstance(value, (date, datetime)) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError('Некорректный курсор')
+    if not isinstance(values, list):
+        raise ValueError('Некорректный курсор')
+    return values
+
+
+def _coerce_cursor(model, ordering, values):
+    """Приводит значения курсора к типам полей модели; курсор приходит от клиента и не доверенный."""
+    if len(values) != len(ordering):
+        raise ValueError('Некорректный курсор')
+    coerced = []
+    for field, value in zip(ordering, values):
+        try:
+            value = model._meta.get_field(field.lstrip('-')).to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise ValueError('Некорректный курсор')
+        if value is None:
+            raise ValueError('Некорректный курсор')
+        coerced.append(value)
+    return coerced
+
+
+def _keyset_filter(ordering, values):
+    """Условие "строго после values" для лексикографического порядка ordering."""
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def _cursor_value(item, field):
+    name = field.lstrip('-')
+    return item[name] if isinstance(item, dict) else getattr(item, name)
+
+
+def paginate_by_cursor(queryset, ordering, cursor=None, page_size=20):
+    """
+    Keyset-пагинация: без COUNT(*) и OFFSET, страница читается по индексу.
+
+    ordering — уникальный порядок по полям самой модели, например ('-sale_date', '-id').
+    Некорректный курсор — ValueError('Некорректный курсор').
+    Возвращает (элементы страницы, курсор следующей страницы или None).
+    """
+    queryset = queryset.order_by(*ordering)
+    if cursor:
+        values = _coerce_cursor(queryset.model, ordering, decode_cursor(cursor))
+        queryset = queryset.filter(_keyset_filter(ordering, values))
+
+    items = list(queryset[:page_size + 1])
+    next_cursor = None
+    if len(items) > page_size:
+        items = items[:page_size]
+        next_cursor = encode_cursor([_cursor_value(items[-1], field) for field in ordering])
+
+    return items, next_cursor
@@ -150,6 +150,8 @@ SIMPLE_JWT = {
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
 }
 
+IDEMPOTENCY_KEY_TTL = timedelta(hours=24)
+
 SPECTACULAR_SETTINGS = {
     'TITLE': 'MIOM Project API',
     'DESCRIPTION': 'API for company and storage management',
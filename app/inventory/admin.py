@@ -1,10 +1,25 @@
 from django.contrib import admin
-from inventory.models import Product, StorageProduct, Supply, SupplyProduct
+from inventory.models import (
+    Product,
+    StorageProduct,
+    Supply,
+    SupplyProduct,
+    CostLayer,
+    StockMovement,
+    StockSnapshot,
+    StockAlert,
+    StockReservation,
+    StockTransfer,
+    StockTransferLine
+)
+from inventory.ledger import record_adjustments, stock_levels
+from inventory.search import search_filter
+from inventory.services import delete_products, sync_on_hand, sync_used_units
 
 class StorageProductInline(admin.TabularInline):
     model = StorageProduct
     extra = 1
-    fields = ('product', 'quantity')
+    fields = ('product', 'quantity', 'reorder_point')
 
 class SupplyProductInline(admin.TabularInline):
     model = SupplyProduct
@@ -14,18 +29,67 @@ class SupplyProductInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'name', 'company', 'purchase_price', 'sale_price', 'total_quantity')
+    list_display = ('id', 'name', 'company', 'purchase_price', 'sale_price', 'total_quantity', 'on_hand')
     list_filter = ('company',)
     search_fields = ('name', 'description')
-    readonly_fields = ('total_quantity', 'created_at', 'updated_at')
+    readonly_fields = ('total_quantity', 'on_hand', 'created_at', 'updated_at')
     inlines = [StorageProductInline]
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_total_quantity()
+
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по FTS-индексу вместо LIKE '%...%' по name и description
+        if not search_term:
+            return queryset, False
+        return queryset.filter(search_filter(search_term)), False
+
+    def save_related(self, request, form, formsets, change):
+        before = stock_levels(product=form.instance)
+        super().save_related(request, form, formsets, change)
+        after = stock_levels(product=form.instance)
+        sync_on_hand([form.instance.pk])
+        sync_used_units({storage_id for storage_id, _ in {**before, **after}})
+        record_adjustments(before, after, 'admin')
+
+    def delete_model(self, request, obj):
+        delete_products(Product.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        delete_products(queryset)
+
+    @admin.display(description='Общий остаток', ordering='stock_total')
+    def total_quantity(self, obj):
+        return obj.stock_total
+
 @admin.register(StorageProduct)
 class StorageProductAdmin(admin.ModelAdmin):
-    list_display = ('id', 'product', 'storage', 'quantity')
+    list_display = ('id', 'product', 'storage', 'quantity', 'reorder_point')
     list_filter = ('storage__company', 'storage')
     search_fields = ('product__name', 'storage__name')
 
+    def save_model(self, request, obj, form, change):
+        previous_product_id = form.initial.get('product')
+        before = stock_levels(pk=obj.pk) if obj.pk else {}
+        super().save_model(request, obj, form, change)
+        sync_on_hand({obj.product_id, previous_product_id} - {None})
+        sync_used_units({obj.storage_id, form.initial.get('storage')} - {None})
+        record_adjustments(before, stock_levels(pk=obj.pk), 'admin')
+
+    def delete_model(self, request, obj):
+        before = stock_levels(pk=obj.pk)
+        super().delete_model(request, obj)
+        sync_on_hand([obj.product_id])
+        sync_used_units([obj.storage_id])
+        record_adjustments(before, {}, 'admin')
+
+    def delete_queryset(self, request, queryset):
+        before = stock_levels(pk__in=queryset.values('pk'))
+        super().delete_queryset(request, queryset)
+        sync_on_hand({product_id for _, product_id in before})
+        sync_used_units({storage_id for storage_id, _ in before})
+        record_adjustments(before, {}, 'admin')
+
 @admin.register(Supply)
 class SupplyAdmin(admin.ModelAdmin):
     list_display = ('id', 'company', 'supplier', 'delivery_date', 'total_amount')
@@ -36,4 +100,74 @@ class SupplyAdmin(admin.ModelAdmin):
 @admin.register(SupplyProduct)
 class SupplyProductAdmin(admin.ModelAdmin):
     list_display = ('id', 'supply', 'product', 'quantity', 'purchase_price')
-    list_filter = ('supply', 'product')
\ No newline at end of file
+    list_filter = ('supply', 'product')
+
+@admin.register(CostLayer)
+class CostLayerAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'company', 'received_at', 'unit_cost', 'quantity', 'remaining')
+    list_filter = ('company',)
+    search_fields = ('product__name',)
+    readonly_fields = ('supply_product', 'created_at')
+
+@admin.register(StockMovement)
+class StockMovementAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'storage', 'product', 'delta', 'reason', 'reference')
+    list_filter = ('reason', 'storage__company', 'storage')
+    search_fields = ('product__name', 'reference')
+    readonly_fields = ('storage', 'product', 'delta', 'reason', 'reference', 'created_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        # Журнал только пополняется: без движения stock-at восстановит неверный остаток
+        return False
+
+@admin.register(StockSnapshot)
+class StockSnapshotAdmin(admin.ModelAdmin):
+    list_display = ('id', 'taken_at', 'storage', 'product', 'quantity')
+    list_filter = ('storage__company', 'storage')
+    search_fields = ('product__name',)
+    readonly_fields = ('storage', 'product', 'quantity', 'taken_at')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockAlert)
+class StockAlertAdmin(admin.ModelAdmin):
+    list_display = ('id', 'created_at', 'kind', 'storage', 'product', 'quantity', 'reorder_point')
+    list_filter = ('kind', 'company', 'storage')
+    search_fields = ('product__name',)
+    readonly_fields = ('created_at',)
+
+class StockTransferLineInline(admin.TabularInline):
+    model = StockTransferLine
+    extra = 0
+    fields = ('product', 'from_storage', 'to_storage', 'quantity')
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+@admin.register(StockTransfer)
+class StockTransferAdmin(admin.ModelAdmin):
+    list_display = ('id', 'company', 'created_at', 'comment')
+    list_filter = ('company',)
+    readonly_fields = ('company', 'created_at')
+    inlines = [StockTransferLineInline]
+
+@admin.register(StockReservation)
+class StockReservationAdmin(admin.ModelAdmin):
+    list_display = ('id', 'key', 'storage', 'product', 'quantity', 'expires_at')
+    list_filter = ('company', 'storage')
+    search_fields = ('key', 'product__name')
+    readonly_fields = ('created_at',)
@@ -0,0 +1,50 @@
+"""
+Оповещения о точке заказа.
+
+Проверяются только строки, затронутые изменением остатка: прежний остаток
+восстанавливается из нового и изменения, поэтому пересечение точки заказа
+находится одним SELECT без опроса всего склада.
+"""
+
+from .models import StockAlert, StorageProduct
+
+# Товаров в одном SELECT (ограничение SQLite на число параметров)
+CHECK_BATCH_SIZE = 500
+
+
+def check_reorder_points(deltas):
+    """Пишет StockAlert для строк {(storage_id, product_id): изменение}, пересекших точку заказа."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    product_ids = sorted({product_id for _, product_id in deltas})
+    storage_ids = {storage_id for storage_id, _ in deltas}
+
+    alerts = []
+    for start in range(0, len(product_ids), CHECK_BATCH_SIZE):
+        rows = StorageProduct.objects.filter(
+            storage_id__in=storage_ids,
+            product_id__in=product_ids[start:start + CHECK_BATCH_SIZE],
+            reorder_point__gt=0
+        ).values_list('storage__company_id', 'storage_id', 'product_id', 'quantity', 'reorder_point')
+
+        for company_id, storage_id, product_id, quantity, reorder_point in rows:
+            delta = deltas.get((storage_id, product_id))
+            if delta is None:
+                continue
+            previous = quantity - delta
+            if previous > reorder_point >= quantity:
+                kind = StockAlert.KIND_LOW
+            elif quantity > reorder_point >= previous:
+                kind = StockAlert.KIND_RESTORED
+            else:
+                continue
+            alerts.append(StockAlert(
+                company_id=company_id,
+                storage_id=storage_id,
+                product_id=product_id,
+                kind=kind,
+                quantity=quantity,
+                reorder_point=reorder_point
+            ))
+
+    StockAlert.objects.bulk_create(alerts)
+    return alerts
@@ -0,0 +1,104 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, F, Value, When
+
+from .models import CostLayer
+from .services import StockConflictError, _batches
+
+
+def open_layers(supply, supply_products):
+    """Открывает слой себестоимости на каждую строку поставки."""
+    CostLayer.objects.bulk_create([
+        CostLayer(
+            company_id=supply.company_id,
+            product_id=supply_product.product_id,
+            supply_product=supply_product,
+            received_at=supply.delivery_date,
+            unit_cost=supply_product.purchase_price,
+            quantity=supply_product.quantity,
+            remaining=supply_product.quantity
+        )
+        for supply_product in supply_products
+    ])
+
+
+def restore_layers(quantities):
+    """Возвращает {layer_id: quantity} в слои (при удалении продажи), по одному UPDATE на пакет."""
+    quantities = {layer_id: quantity for layer_id, quantity in quantities.items() if quantity}
+
+    for batch in _batches(quantities):
+        CostLayer.objects.filter(pk__in=list(batch)).update(
+            remaining=F('remaining') + _per_layer(batch)
+        )
+
+
+def _per_layer(quantities):
+    """CASE: количество для слоя пакета {layer_id: quantity}."""
+    return Case(
+        *[When(pk=layer_id, then=Value(quantity)) for layer_id, quantity in quantities.items()],
+        default=None
+    )
+
+
+class CostLayerConsumer:
+    """
+    FIFO-списание слоев себестоимости под позиции продаж.
+
+    Открытые слои товаров загружаются и блокируются одним запросом, списание
+    считается в памяти, остатки слоев уменьшаются условными UPDATE в save()
+    (по одному на STOCK_BATCH_SIZE слоев).
+    Единицы, на которые слоев не хватило (остатки, внесенные в обход поставок),
+    оцениваются по текущей цене закупки товара.
+    """
+
+    def __init__(self, company, product_ids):
+        self.layers = defaultdict(list)
+        self._consumed = defaultdict(int)
+
+        layers = CostLayer.objects.select_for_update().filter(
+            company=company,
+            product_id__in=set(product_ids),
+            remaining__gt=0
+        ).order_by('received_at', 'id')
+        for layer in layers:
+            self.layers[layer.product_id].append(layer)
+
+    def consume(self, product, quantity):
+        """Возвращает (себестоимость, [(layer или None, quantity, unit_cost), ...])."""
+        remaining_quantity = quantity
+        parts = []
+
+        for layer in self.layers[product.id]:
+            if remaining_quantity <= 0:
+                break
+            if layer.remaining == 0:
+                continue
+
+            taken = min(remaining_quantity, layer.remaining)
+            layer.remaining -= taken
+            remaining_quantity -= taken
+            self._consumed[layer.pk] += taken
+            parts.append((layer, taken, layer.unit_cost))
+
+        if remaining_quantity > 0:
+            parts.append((None, remaining_quantity, product.purchase_price))
+
+        cost = sum((unit_cost * taken for _, taken, unit_cost in parts), Decimal('0'))
+        return cost, parts
+
+    def save(self):
+        if not self._consumed:
+            return
+
+        with transaction.atomic():
+            for batch in _batches(self._consumed):
+                decrement = _per_layer(batch)
+                updated = CostLayer.objects.filter(pk__in=list(batch), remaining__gte=decrement).update(
+                    remaining=F('remaining') - decrement
+                )
+                if updated != len(batch):
+                    raise StockConflictError('Слои себестоимости изменились параллельным запросом, повторите операцию')
+
+        self._consumed = defaultdict(int)
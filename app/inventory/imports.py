@@ -0,0 +1,114 @@
+"""
+Потоковый импорт товаров из CSV.
+
+Файл читается построчно (csv.DictReader поверх TextIOWrapper), строки
+проверяются и сохраняются пакетами, поэтому память не зависит от размера файла.
+"""
+
+import csv
+import io
+
+from django.utils import timezone
+from rest_framework import serializers
+
+from .models import Product
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+IMPORT_COLUMNS = ('name', 'description', 'purchase_price', 'sale_price')
+
+
+class ProductImportRowSerializer(serializers.Serializer):
+    name = serializers.CharField(max_length=255)
+    description = serializers.CharField(required=False, allow_blank=True, default='')
+    purchase_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+    sale_price = serializers.DecimalField(max_digits=10, decimal_places=2, min_value=0)
+
+
+class ImportFormatError(Exception):
+    pass
+
+
+def import_products(company, upload, upsert=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Импортирует товары компании из загруженного CSV (колонки IMPORT_COLUMNS).
+
+    С upsert существующие товары с тем же названием обновляются, иначе
+    каждая строка создает новый товар. Строки с ошибками пропускаются
+    и попадают в отчет (не больше MAX_REPORTED_ERRORS).
+    """
+    stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(stream)
+    report = {'created': 0, 'updated': 0, 'failed': 0, 'errors': [], 'errors_truncated': False}
+    try:
+        if reader.fieldnames is None:
+            raise ImportFormatError('Файл пуст')
+        missing = [column for column in IMPORT_COLUMNS if column != 'description' and column not in reader.fieldnames]
+        if missing:
+            raise ImportFormatError(f'Нет обязательных колонок: {", ".join(missing)}')
+
+        batch = []
+        for row in reader:
+            # line_num — номер строки в файле с учетом заголовка
+            batch.append((reader.line_num, row))
+            if len(batch) >= batch_size:
+                _import_batch(company, batch, upsert, report)
+                batch = []
+        _import_batch(company, batch, upsert, report)
+    except (UnicodeDecodeError, csv.Error) as error:
+        raise ImportFormatError(f'Ошибка чтения CSV в строке {reader.line_num}: {error}')
+    finally:
+        # Иначе TextIOWrapper закроет файл загрузки вместе с собой
+        stream.detach()
+
+    return report
+
+
+def _import_batch(company, batch, upsert, report):
+    valid = {}
+    for line, row in batch:
+        serializer = ProductImportRowSerializer(data={
+            column: (row.get(column) or '').strip() for column in IMPORT_COLUMNS
+        })
+        if not serializer.is_valid():
+            report['failed'] += 1
+            if len(report['errors']) < MAX_REPORTED_ERRORS:
+                report['errors'].append({'row': line, 'errors': serializer.errors})
+            else:
+                report['errors_truncated'] = True
+            continue
+        data = serializer.validated_data
+        # Повтор названия внутри пакета при upsert — побеждает последняя строка
+        valid[data['name'] if upsert else line] = data
+
+    if not valid:
+        return
+
+    existing = {}
+    if upsert:
+        for product in Product.objects.filter(company=company, name__in=list(valid)).order_by('id'):
+            existing.setdefault(product.name, product)
+
+    now = timezone.now()
+    to_create = []
+    to_update = []
+    for key, data in valid.items():
+        product = existing.get(key)
+        if product is None:
+            to_create.append(Product(company=company, **data))
+            continue
+        for field, value in data.items():
+            setattr(product, field, value)
+        product.updated_at = now
+        to_update.append(product)
+
+    Product.objects.bulk_create(to_create, batch_size=IMPORT_BATCH_SIZE)
+    if to_update:
+        Product.objects.bulk_update(
+            to_update,
+            ['description', 'purchase_price', 'sale_price', 'updated_at'],
+            batch_size=IMPORT_BATCH_SIZE
+        )
+
+    report['created'] += len(to_create)
+    report['updated'] += len(to_update)
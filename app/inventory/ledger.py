@@ -0,0 +1,107 @@
+"""
+Журнал движений остатков и снимки для запросов "остаток на дату".
+
+Остаток на момент t = ближайший снимок не позже t плюс сумма движений
+между снимком и t, поэтому запрос читает только ограниченный отрезок журнала.
+"""
+
+from collections import defaultdict
+
+from django.db.models import Max, Sum
+from django.utils import timezone
+
+from .alerts import check_reorder_points
+from .models import StockMovement, StockSnapshot, StorageProduct
+
+
+def record_movements(deltas, reason, reference=''):
+    """Пишет в журнал {(storage_id, product_id): изменение} одним bulk_create."""
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(
+            storage_id=storage_id,
+            product_id=product_id,
+            delta=delta,
+            reason=reason,
+            reference=reference,
+            created_at=now
+        )
+        for (storage_id, product_id), delta in deltas.items()
+        if delta
+    ])
+
+
+def stock_levels(**filters):
+    """Текущие остатки {(storage_id, product_id): quantity} по фильтру StorageProduct."""
+    return {
+        (storage_id, product_id): quantity
+        for storage_id, product_id, quantity in StorageProduct.objects.filter(**filters).values_list(
+            'storage_id', 'product_id', 'quantity'
+        )
+    }
+
+
+def record_adjustments(before, after, reference=''):
+    """Записывает разницу двух stock_levels как корректировки (правки в обход сервиса, например в админке)."""
+    deltas = {
+        key: after.get(key, 0) - before.get(key, 0)
+        for key in set(before) | set(after)
+    }
+    check_reorder_points(deltas)
+    record_movements(deltas, StockMovement.REASON_ADJUSTMENT, reference)
+
+
+def take_snapshot(batch_size=2000):
+    """Снимок всех ненулевых остатков с общим taken_at. Возвращает (taken_at, число строк)."""
+    taken_at = timezone.now()
+    rows = StorageProduct.objects.filter(quantity__gt=0).values_list(
+        'storage_id', 'product_id', 'quantity'
+    ).order_by('id')
+
+    created = 0
+    batch = []
+    for storage_id, product_id, quantity in rows.iterator(chunk_size=batch_size):
+        batch.append(StockSnapshot(
+            storage_id=storage_id,
+            product_id=product_id,
+            quantity=quantity,
+            taken_at=taken_at
+        ))
+        if len(batch) >= batch_size:
+            StockSnapshot.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+    StockSnapshot.objects.bulk_create(batch)
+    created += len(batch)
+
+    return taken_at, created
+
+
+def stock_at(company, moment, storage_id=None, product_id=None):
+    """
+    Остатки компании на момент moment: (время снимка или None, {(storage_id, product_id): quantity}).
+
+    Без снимка до moment остаток восстанавливается по журналу с начала.
+    """
+    filters = {'storage__company': company}
+    if storage_id is not None:
+        filters['storage_id'] = storage_id
+    if product_id is not None:
+        filters['product_id'] = product_id
+
+    snapshots = StockSnapshot.objects.filter(taken_at__lte=moment, **filters)
+    snapshot_at = snapshots.aggregate(taken_at=Max('taken_at'))['taken_at']
+
+    levels = defaultdict(int)
+    movements = StockMovement.objects.filter(created_at__lt=moment, **filters)
+    if snapshot_at is not None:
+        for row_storage_id, row_product_id, quantity in snapshots.filter(taken_at=snapshot_at).values_list(
+            'storage_id', 'product_id', 'quantity'
+        ):
+            levels[(row_storage_id, row_product_id)] = quantity
+        movements = movements.filter(created_at__gt=snapshot_at)
+
+    for row in movements.values('storage_id', 'product_id').annotate(total=Sum('delta')).order_by():
+        levels[(row['storage_id'], row['product_id'])] += row['total']
+
+    return snapshot_at, {key: quantity for key, quantity in levels.items() if quantity}
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from inventory.ledger import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет снимок текущих остатков для запросов "остаток на дату" (запускать периодически, например раз в сутки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Строк в одном INSERT')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            taken_at, created = take_snapshot(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Снимок на {taken_at.isoformat()}: строк {created}'))
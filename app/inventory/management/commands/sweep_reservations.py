@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from inventory.reservations import SWEEP_BATCH_SIZE, sweep_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаляет истекшие брони товаров (запускать периодически, например раз в минуту)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE, help='Строк в одном DELETE')
+
+    def handle(self, *args, **options):
+        deleted = sweep_expired(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Удалено истекших броней: {deleted}'))
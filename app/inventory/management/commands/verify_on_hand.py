@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+
+from authenticate.models import Storage
+from inventory.models import Product
+from inventory.services import sync_on_hand, sync_used_units
+
+
+class Command(BaseCommand):
+    help = 'Сверяет Product.on_hand и Storage.used_units с остатками по складам и при --repair исправляет расхождения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repair', action='store_true', help='Пересчитать счетчики у расходящихся товаров и складов')
+
+    def handle(self, *args, **options):
+        mismatched = Product.objects.annotate(
+            actual=Coalesce(Sum('storage_products__quantity'), 0)
+        ).exclude(on_hand=F('actual')).values_list('id', 'name', 'on_hand', 'actual')
+
+        mismatched_storages = Storage.objects.annotate(
+            actual=Coalesce(Sum('storage_products__quantity'), 0)
+        ).exclude(used_units=F('actual')).values_list('id', 'name', 'used_units', 'actual')
+
+        mismatched = list(mismatched)
+        for product_id, name, on_hand, actual in mismatched:
+            self.stdout.write(f'#{product_id} {name}: on_hand={on_hand}, по складам={actual}')
+
+        mismatched_storages = list(mismatched_storages)
+        for storage_id, name, used_units, actual in mismatched_storages:
+            self.stdout.write(f'Склад #{storage_id} {name}: used_units={used_units}, по остаткам={actual}')
+
+        if not mismatched and not mismatched_storages:
+            self.stdout.write(self.style.SUCCESS('Расхождений нет'))
+            return
+
+        if options['repair']:
+            with transaction.atomic():
+                repaired = sync_on_hand([product_id for product_id, *_ in mismatched])
+                repaired_storages = sync_used_units([storage_id for storage_id, *_ in mismatched_storages])
+            self.stdout.write(self.style.SUCCESS(
+                f'Исправлено товаров: {repaired}, складов: {repaired_storages}'
+            ))
+        else:
+            self.stdout.write(self.style.WARNING(
+                f'Расхождений: {len(mismatched) + len(mismatched_storages)}. Запустите с --repair'
+            ))
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:45
+
+from django.db import migrations, models
+from django.db.models import Sum
+from django.utils import timezone
+import django.db.models.deletion
+
+
+def open_initial_layers(apps, schema_editor):
+    """Открывает по слою на текущий остаток каждого товара по его цене закупки."""
+    StorageProduct = apps.get_model('inventory', 'StorageProduct')
+    CostLayer = apps.get_model('inventory', 'CostLayer')
+
+    now = timezone.now()
+    stock = StorageProduct.objects.values(
+        'product_id', 'product__company_id', 'product__purchase_price'
+    ).annotate(total=Sum('quantity')).order_by()
+
+    CostLayer.objects.bulk_create([
+        CostLayer(
+            company_id=row['product__company_id'],
+            product_id=row['product_id'],
+            received_at=now,
+            unit_cost=row['product__purchase_price'],
+            quantity=row['total'],
+            remaining=row['total']
+        )
+        for row in stock
+        if row['total']
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0003_alter_company_inn'),
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CostLayer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('received_at', models.DateTimeField(verbose_name='Дата поступления')),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Себестоимость единицы')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Поступило')),
+                ('remaining', models.PositiveIntegerField(verbose_name='Остаток слоя')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='authenticate.company', verbose_name='Компания')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='cost_layers', to='inventory.product', verbose_name='Товар')),
+                ('supply_product', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='cost_layers', to='inventory.supplyproduct', verbose_name='Товар в поставке')),
+            ],
+            options={
+                'verbose_name': 'Слой себестоимости',
+                'verbose_name_plural': 'Слои себестоимости',
+                'indexes': [models.Index(condition=models.Q(('remaining__gt', 0)), fields=['product', 'received_at', 'id'], name='costlayer_open_fifo_idx')],
+            },
+        ),
+        migrations.RunPython(open_initial_layers, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:47
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def backfill_on_hand(apps, schema_editor):
+    Product = apps.get_model('inventory', 'Product')
+    StorageProduct = apps.get_model('inventory', 'StorageProduct')
+
+    totals = StorageProduct.objects.filter(product_id=OuterRef('pk')).values('product_id').annotate(
+        total=Sum('quantity')
+    ).values('total')
+    Product.objects.update(on_hand=Coalesce(Subquery(totals), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_costlayer'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='on_hand',
+            field=models.PositiveIntegerField(default=0, verbose_name='Всего на складах'),
+        ),
+        migrations.RunPython(backfill_on_hand, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,67 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:59
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+from django.utils import timezone
+
+
+def snapshot_current_stock(apps, schema_editor):
+    """Журнал начинается сейчас: снимок текущих остатков — его начальная точка."""
+    StorageProduct = apps.get_model('inventory', 'StorageProduct')
+    StockSnapshot = apps.get_model('inventory', 'StockSnapshot')
+
+    taken_at = timezone.now()
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(storage_id=storage_id, product_id=product_id, quantity=quantity, taken_at=taken_at)
+            for storage_id, product_id, quantity in StorageProduct.objects.filter(quantity__gt=0).values_list(
+                'storage_id', 'product_id', 'quantity'
+            ).iterator()
+        ],
+        batch_size=2000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0003_alter_company_inn'),
+        ('inventory', '0003_product_on_hand'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('taken_at', models.DateTimeField(verbose_name='Время снимка')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='inventory.product', verbose_name='Товар')),
+                ('storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_snapshots', to='authenticate.storage', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Снимок остатков',
+                'verbose_name_plural': 'Снимки остатков',
+                'indexes': [models.Index(fields=['storage', 'taken_at'], name='stocksnapshot_storage_time_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='StockMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('delta', models.IntegerField(verbose_name='Изменение')),
+                ('reason', models.CharField(choices=[('supply', 'Поставка'), ('sale', 'Продажа'), ('sale_delete', 'Удаление продажи'), ('adjustment', 'Корректировка')], max_length=20, verbose_name='Причина')),
+                ('reference', models.CharField(blank=True, max_length=64, verbose_name='Документ')),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Время')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='inventory.product', verbose_name='Товар')),
+                ('storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_movements', to='authenticate.storage', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Движение товара',
+                'verbose_name_plural': 'Движения товаров',
+                'indexes': [models.Index(fields=['storage', 'created_at'], name='stockmovement_storage_time_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_current_stock, migrations.RunPython.noop),
+    ]
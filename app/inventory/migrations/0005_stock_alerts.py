@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0004_storage_used_units'),
+        ('inventory', '0004_stock_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='storageproduct',
+            name='reorder_point',
+            field=models.PositiveIntegerField(default=0, help_text='Оповещать, когда остаток опустится до этого значения (0 — не следить)', verbose_name='Точка заказа'),
+        ),
+        migrations.CreateModel(
+            name='StockAlert',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('low', 'Остаток на точке заказа или ниже'), ('restored', 'Остаток восстановлен')], max_length=10, verbose_name='Тип')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Остаток')),
+                ('reorder_point', models.PositiveIntegerField(verbose_name='Точка заказа')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='authenticate.company', verbose_name='Компания')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='inventory.product', verbose_name='Товар')),
+                ('storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_alerts', to='authenticate.storage', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Оповещение об остатке',
+                'verbose_name_plural': 'Оповещения об остатках',
+                'indexes': [models.Index(fields=['company', 'id'], name='stockalert_company_feed_idx')],
+            },
+        ),
+    ]
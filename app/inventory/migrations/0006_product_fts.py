@@ -0,0 +1,63 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:03
+
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE inventory_product_fts USING fts5(
+        name, description,
+        content='inventory_product', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER inventory_product_fts_insert AFTER INSERT ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_product_fts_delete AFTER DELETE ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER inventory_product_fts_update AFTER UPDATE OF name, description ON inventory_product BEGIN
+        INSERT INTO inventory_product_fts(inventory_product_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO inventory_product_fts(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    "INSERT INTO inventory_product_fts(inventory_product_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS inventory_product_fts_insert',
+    'DROP TRIGGER IF EXISTS inventory_product_fts_delete',
+    'DROP TRIGGER IF EXISTS inventory_product_fts_update',
+    'DROP TABLE IF EXISTS inventory_product_fts',
+]
+
+
+def run_on_sqlite(statements):
+    # FTS5 есть только в SQLite; на других СУБД поиск работает через icontains
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.RunPython(run_on_sqlite(CREATE_SQL), run_on_sqlite(DROP_SQL)),
+    ]
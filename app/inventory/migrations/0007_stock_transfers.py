@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:24
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0004_storage_used_units'),
+        ('inventory', '0006_product_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockTransfer',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('comment', models.TextField(blank=True, verbose_name='Комментарий')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_transfers', to='authenticate.company', verbose_name='Компания')),
+            ],
+            options={
+                'verbose_name': 'Перемещение',
+                'verbose_name_plural': 'Перемещения',
+            },
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='reason',
+            field=models.CharField(choices=[('supply', 'Поставка'), ('sale', 'Продажа'), ('sale_delete', 'Удаление продажи'), ('adjustment', 'Корректировка'), ('transfer', 'Перемещение')], max_length=20, verbose_name='Причина'),
+        ),
+        migrations.CreateModel(
+            name='StockTransferLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('from_storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_transfer_lines', to='authenticate.storage', verbose_name='Со склада')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transfer_lines', to='inventory.product', verbose_name='Товар')),
+                ('to_storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='incoming_transfer_lines', to='authenticate.storage', verbose_name='На склад')),
+                ('transfer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='inventory.stocktransfer', verbose_name='Перемещение')),
+            ],
+            options={
+                'verbose_name': 'Строка перемещения',
+                'verbose_name_plural': 'Строки перемещений',
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stock_transfers'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='supply',
+            index=models.Index(fields=['company', 'delivery_date', 'id'], name='supply_company_date_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:30
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0004_storage_used_units'),
+        ('inventory', '0008_supply_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockReservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.UUIDField(db_index=True, default=uuid.uuid4, verbose_name='Ключ брони')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('expires_at', models.DateTimeField(verbose_name='Действует до')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stock_reservations', to='authenticate.company', verbose_name='Компания')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='inventory.product', verbose_name='Товар')),
+                ('storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='authenticate.storage', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Бронь товара',
+                'verbose_name_plural': 'Брони товаров',
+                'indexes': [models.Index(fields=['product', 'expires_at'], name='reservation_product_exp_idx'), models.Index(fields=['expires_at'], name='reservation_expires_idx')],
+            },
+        ),
+    ]
@@ -1,7 +1,26 @@
+import uuid
+
 from django.db import models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from authenticate.models import Company, Storage
 from companies.models import Supplier
 
+class ProductQuerySet(models.QuerySet):
+    def with_total_quantity(self):
+        """
+        Общий остаток по всем складам и активные брони одним запросом
+        (вместо Product.total_quantity и Product.reserved_quantity на каждую строку).
+        """
+        reserved = StockReservation.objects.filter(product=OuterRef('pk')).active().values(
+            'product'
+        ).annotate(total=Sum('quantity')).values('total')
+        return self.annotate(
+            stock_total=Coalesce(Sum('storage_products__quantity'), 0),
+            stock_reserved=Coalesce(Subquery(reserved), 0)
+        )
+
 class Product(models.Model):
     company = models.ForeignKey(
         Company,
@@ -21,9 +40,12 @@ class Product(models.Model):
         decimal_places=2,
         verbose_name='Цена продажи'
     )
+    on_hand = models.PositiveIntegerField(default=0, verbose_name='Всего на складах')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = ProductQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.name}"
 
@@ -32,6 +54,10 @@ class Product(models.Model):
         from django.db.models import Sum
         return self.storage_products.aggregate(total=Sum('quantity'))['total'] or 0
 
+    @property
+    def reserved_quantity(self):
+        return self.reservations.active().aggregate(total=Sum('quantity'))['total'] or 0
+
     class Meta:
         verbose_name = 'Товар'
         verbose_name_plural = 'Товары'
@@ -50,6 +76,11 @@ class StorageProduct(models.Model):
         verbose_name='Товар'
     )
     quantity = models.PositiveIntegerField(default=0, verbose_name='Количество на складе')
+    reorder_point = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Точка заказа',
+        help_text='Оповещать, когда остаток опустится до этого значения (0 — не следить)'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -90,6 +121,9 @@ class Supply(models.Model):
     class Meta:
         verbose_name = 'Поставка'
         verbose_name_plural = 'Поставки'
+        indexes = [
+            models.Index(fields=['company', 'delivery_date', 'id'], name='supply_company_date_idx'),
+        ]
 
 class SupplyProduct(models.Model):
     supply = models.ForeignKey(
@@ -119,4 +153,266 @@ class SupplyProduct(models.Model):
     class Meta:
         verbose_name = 'Товар в поставке'
         verbose_name_plural = 'Товары в поставках'
-        unique_together = ('supply', 'product')
\ No newline at end of file
+        unique_together = ('supply', 'product')
+
+class CostLayer(models.Model):
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='cost_layers',
+        verbose_name='Компания'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='cost_layers',
+        verbose_name='Товар'
+    )
+    supply_product = models.ForeignKey(
+        SupplyProduct,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='cost_layers',
+        verbose_name='Товар в поставке'
+    )
+    received_at = models.DateTimeField(verbose_name='Дата поступления')
+    unit_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Себестоимость единицы'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Поступило')
+    remaining = models.PositiveIntegerField(verbose_name='Остаток слоя')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.name} - {self.remaining}/{self.quantity} по {self.unit_cost}"
+
+    class Meta:
+        verbose_name = 'Слой себестоимости'
+        verbose_name_plural = 'Слои себестоимости'
+        indexes = [
+            models.Index(
+                fields=['product', 'received_at', 'id'],
+                condition=models.Q(remaining__gt=0),
+                name='costlayer_open_fifo_idx'
+            ),
+        ]
+
+class StockMovement(models.Model):
+    """
+    Журнал изменений остатков (только добавление записей).
+
+    Время движения — момент изменения остатка в системе, а не дата
+    документа: иначе снимок остатков и движения после него не сходились бы.
+    """
+    REASON_SUPPLY = 'supply'
+    REASON_SALE = 'sale'
+    REASON_SALE_DELETE = 'sale_delete'
+    REASON_ADJUSTMENT = 'adjustment'
+    REASON_TRANSFER = 'transfer'
+    REASON_CHOICES = (
+        (REASON_SUPPLY, 'Поставка'),
+        (REASON_SALE, 'Продажа'),
+        (REASON_SALE_DELETE, 'Удаление продажи'),
+        (REASON_ADJUSTMENT, 'Корректировка'),
+        (REASON_TRANSFER, 'Перемещение'),
+    )
+
+    storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name='Склад'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name='Товар'
+    )
+    delta = models.IntegerField(verbose_name='Изменение')
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES, verbose_name='Причина')
+    reference = models.CharField(max_length=64, blank=True, verbose_name='Документ')
+    created_at = models.DateTimeField(default=timezone.now, verbose_name='Время')
+
+    def __str__(self):
+        return f"{self.product.name} - {self.storage.name}: {self.delta:+d} ({self.get_reason_display()})"
+
+    class Meta:
+        verbose_name = 'Движение товара'
+        verbose_name_plural = 'Движения товаров'
+        indexes = [
+            models.Index(fields=['storage', 'created_at'], name='stockmovement_storage_time_idx'),
+        ]
+
+class StockSnapshot(models.Model):
+    """Остаток строки StorageProduct на момент taken_at; снимки всех складов делаются разом."""
+    storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name='Склад'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name='Товар'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    taken_at = models.DateTimeField(verbose_name='Время снимка')
+
+    def __str__(self):
+        return f"{self.product.name} - {self.storage.name}: {self.quantity} на {self.taken_at}"
+
+    class Meta:
+        verbose_name = 'Снимок остатков'
+        verbose_name_plural = 'Снимки остатков'
+        indexes = [
+            models.Index(fields=['storage', 'taken_at'], name='stocksnapshot_storage_time_idx'),
+        ]
+
+class StockAlert(models.Model):
+    """Пересечение точки заказа остатком: вниз (low) или обратно вверх (restored)."""
+    KIND_LOW = 'low'
+    KIND_RESTORED = 'restored'
+    KIND_CHOICES = (
+        (KIND_LOW, 'Остаток на точке заказа или ниже'),
+        (KIND_RESTORED, 'Остаток восстановлен'),
+    )
+
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='stock_alerts',
+        verbose_name='Компания'
+    )
+    storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='stock_alerts',
+        verbose_name='Склад'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_alerts',
+        verbose_name='Товар'
+    )
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='Тип')
+    quantity = models.PositiveIntegerField(verbose_name='Остаток')
+    reorder_point = models.PositiveIntegerField(verbose_name='Точка заказа')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.product.name} - {self.storage.name}: {self.get_kind_display()} ({self.quantity})"
+
+    class Meta:
+        verbose_name = 'Оповещение об остатке'
+        verbose_name_plural = 'Оповещения об остатках'
+        indexes = [
+            models.Index(fields=['company', 'id'], name='stockalert_company_feed_idx'),
+        ]
+
+class StockTransfer(models.Model):
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='stock_transfers',
+        verbose_name='Компания'
+    )
+    comment = models.TextField(blank=True, verbose_name='Комментарий')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Перемещение #{self.id}"
+
+    class Meta:
+        verbose_name = 'Перемещение'
+        verbose_name_plural = 'Перемещения'
+
+class StockTransferLine(models.Model):
+    transfer = models.ForeignKey(
+        StockTransfer,
+        on_delete=models.CASCADE,
+        related_name='lines',
+        verbose_name='Перемещение'
+    )
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='transfer_lines',
+        verbose_name='Товар'
+    )
+    from_storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='outgoing_transfer_lines',
+        verbose_name='Со склада'
+    )
+    to_storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='incoming_transfer_lines',
+        verbose_name='На склад'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+
+    def __str__(self):
+        return f"{self.product.name}: {self.from_storage.name} -> {self.to_storage.name} ({self.quantity} шт.)"
+
+    class Meta:
+        verbose_name = 'Строка перемещения'
+        verbose_name_plural = 'Строки перемещений'
+
+class StockReservationQuerySet(models.QuerySet):
+    def active(self, moment=None):
+        return self.filter(expires_at__gt=moment or timezone.now())
+
+    def totals(self):
+        """Забронированное количество {(storage_id, product_id): quantity}."""
+        return {
+            (row['storage_id'], row['product_id']): row['total']
+            for row in self.values('storage_id', 'product_id').annotate(total=Sum('quantity')).order_by()
+        }
+
+class StockReservation(models.Model):
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name='Компания'
+    )
+    key = models.UUIDField(default=uuid.uuid4, db_index=True, verbose_name='Ключ брони')
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name='Товар'
+    )
+    storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='reservations',
+        verbose_name='Склад'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    expires_at = models.DateTimeField(verbose_name='Действует до')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = StockReservationQuerySet.as_manager()
+
+    def __str__(self):
+        return f"Бронь {self.key}: {self.product.name} ({self.quantity} шт.)"
+
+    class Meta:
+        verbose_name = 'Бронь товара'
+        verbose_name_plural = 'Брони товаров'
+        indexes = [
+            # Активные брони товара — диапазон по expires_at внутри product_id
+            models.Index(fields=['product', 'expires_at'], name='reservation_product_exp_idx'),
+            # Очистка истекших броней
+            models.Index(fields=['expires_at'], name='reservation_expires_idx'),
+        ]
@@ -0,0 +1,98 @@
+"""
+Брони остатков на время оформления заказа.
+
+Бронь не меняет StorageProduct: забронированные единицы только вычитаются
+из доступного количества (StockAllocator, transfer_stock), поэтому брошенная
+корзина ничего не возвращает на склад — бронь просто истекает и удаляется
+очисткой. Активные брони товара читаются по индексу (product, expires_at).
+"""
+
+import uuid
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import StockReservation
+from .services import StockAllocator
+
+RESERVATION_TTL = timedelta(minutes=15)
+MAX_RESERVATION_TTL = timedelta(hours=24)
+SWEEP_BATCH_SIZE = 1000
+
+
+class ReservationError(Exception):
+    """Бронь не найдена или уже истекла."""
+
+
+def reserve(company, items, ttl=RESERVATION_TTL):
+    """
+    Бронирует позиции [{'product': id, 'quantity': n}, ...] на ttl.
+
+    Склады выбираются тем же FIFO-распределением, что и при продаже,
+    уже забронированные единицы пропускаются. Все строки брони получают
+    общий ключ. Нехватка товара — AllocationError, ничего не бронируется.
+    """
+    allocator = StockAllocator(company, [item['product'] for item in items])
+    lines = allocator.allocate(items)
+
+    key = uuid.uuid4()
+    expires_at = timezone.now() + ttl
+    return StockReservation.objects.bulk_create([
+        StockReservation(
+            company=company,
+            key=key,
+            product=product,
+            storage_id=storage_product.storage_id,
+            quantity=quantity,
+            expires_at=expires_at
+        )
+        for product, _, deductions in lines
+        for storage_product, quantity in deductions
+    ])
+
+
+def take_reservation(company, key):
+    """
+    Забирает активную бронь под продажу: блокирует и удаляет ее строки.
+
+    Возвращает строки брони с загруженными товарами; если брони нет
+    или она истекла — ReservationError.
+    """
+    reservations = list(
+        StockReservation.objects.select_for_update(of=('self',)).select_related('product').filter(
+            company=company,
+            key=key
+        ).active().order_by('id')
+    )
+    if not reservations:
+        raise ReservationError('Бронь не найдена или истекла')
+
+    StockReservation.objects.filter(pk__in=[reservation.pk for reservation in reservations]).delete()
+    return reservations
+
+
+def release(company, key):
+    """Снимает бронь досрочно. Возвращает число удаленных строк."""
+    deleted, _ = StockReservation.objects.filter(company=company, key=key).delete()
+    return deleted
+
+
+def sweep_expired(batch_size=SWEEP_BATCH_SIZE, moment=None):
+    """
+    Удаляет истекшие брони пакетами по batch_size строк.
+
+    Каждый пакет — отдельный короткий DELETE по первичному ключу, поэтому
+    очистка большого хвоста не держит блокировку таблицы надолго.
+    """
+    moment = moment or timezone.now()
+    deleted = 0
+    while True:
+        ids = list(
+            StockReservation.objects.filter(expires_at__lte=moment).order_by('expires_at').values_list(
+                'id', flat=True
+            )[:batch_size]
+        )
+        if not ids:
+            return deleted
+        count, _ = StockReservation.objects.filter(pk__in=ids).delete()
+        deleted += count
@@ -0,0 +1,82 @@
+"""
+Полнотекстовый поиск товаров.
+
+На SQLite используется FTS5-таблица inventory_product_fts (external content
+над inventory_product), которую синхронизируют триггеры из миграции
+0006_product_fts — в том числе при bulk_create/update в обход save().
+На других СУБД поиск откатывается к icontains.
+"""
+
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'inventory_product_fts'
+# Вес совпадения в названии относительно описания для bm25
+NAME_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+
+def fts_enabled():
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """Строка пользователя -> запрос FTS5: все слова как префиксы, без операторов FTS."""
+    words = re.findall(r'\w+', text)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def search_filter(text):
+    """Условие pk__in по FTS-индексу для произвольного queryset товаров (например, в админке)."""
+    if not fts_enabled():
+        return Q(name__icontains=text) | Q(description__icontains=text)
+    query = fts_query(text)
+    if not query:
+        return Q(pk__in=[])
+    return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [query]))
+
+
+def search_products(company, text, offset=0, limit=20):
+    """
+    Ищет товары компании: (число найденных, ID страницы по убыванию релевантности).
+
+    Страница читается из индекса с ORDER BY bm25 и LIMIT/OFFSET, сами
+    товары загружаются отдельно только для нее. CROSS JOIN фиксирует порядок
+    соединения: SQLite идет от совпадений в индексе к товарам, а не
+    проверяет MATCH для каждого товара компании.
+    """
+    from .models import Product
+
+    query = fts_query(text)
+    if not query:
+        return 0, []
+
+    if not fts_enabled():
+        products = Product.objects.filter(company=company).filter(
+            Q(name__icontains=text) | Q(description__icontains=text)
+        ).order_by('name', 'id')
+        return products.count(), list(products.values_list('id', flat=True)[offset:offset + limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM {FTS_TABLE} f '
+            f'CROSS JOIN inventory_product p ON p.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND p.company_id = %s',
+            [query, company.pk]
+        )
+        count = cursor.fetchone()[0]
+
+        cursor.execute(
+            f'SELECT f.rowid FROM {FTS_TABLE} f '
+            f'CROSS JOIN inventory_product p ON p.id = f.rowid '
+            f'WHERE {FTS_TABLE} MATCH %s AND p.company_id = %s '
+            f'ORDER BY bm25({FTS_TABLE}, %s, %s), f.rowid '
+            f'LIMIT %s OFFSET %s',
+            [query, company.pk, NAME_WEIGHT, DESCRIPTION_WEIGHT, limit, offset]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    return count, ids
@@ -1,15 +1,35 @@
 from rest_framework import serializers
-from .models import Product, StorageProduct, Supply, SupplyProduct
+from .models import (
+    Product, StorageProduct, StockAlert, StockReservation, StockTransfer, StockTransferLine, Supply, SupplyProduct
+)
 from companies.serializers import SupplierSerializer
+from datetime import timedelta
+from .reservations import MAX_RESERVATION_TTL, RESERVATION_TTL
 from django.utils import timezone
 
 class ProductSerializer(serializers.ModelSerializer):
-    total_quantity = serializers.IntegerField(read_only=True)
+    total_quantity = serializers.SerializerMethodField()
+    reserved_quantity = serializers.SerializerMethodField()
+    available_quantity = serializers.SerializerMethodField()
 
     class Meta:
         model = Product
         fields = '__all__'
-        read_only_fields = ('company', 'created_at', 'updated_at')
+        read_only_fields = ('company', 'on_hand', 'created_at', 'updated_at')
+
+    def get_total_quantity(self, obj) -> int:
+        # Списки получают остаток аннотацией with_total_quantity(), одиночный объект — свойством
+        if hasattr(obj, 'stock_total'):
+            return obj.stock_total
+        return obj.total_quantity
+
+    def get_reserved_quantity(self, obj) -> int:
+        if hasattr(obj, 'stock_reserved'):
+            return obj.stock_reserved
+        return obj.reserved_quantity
+
+    def get_available_quantity(self, obj) -> int:
+        return max(obj.on_hand - self.get_reserved_quantity(obj), 0)
 
 class StorageProductSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -18,7 +38,16 @@ class StorageProductSerializer(serializers.ModelSerializer):
     class Meta:
         model = StorageProduct
         fields = '__all__'
-        read_only_fields = ('created_at', 'updated_at')
+        # Количество меняется только поставками, продажами и перемещениями
+        read_only_fields = ('storage', 'product', 'quantity', 'created_at', 'updated_at')
+
+class StockAlertSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    storage_name = serializers.CharField(source='storage.name', read_only=True)
+
+    class Meta:
+        model = StockAlert
+        fields = ('id', 'kind', 'storage', 'storage_name', 'product', 'product_name', 'quantity', 'reorder_point', 'created_at')
 
 class SupplyProductSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -30,7 +59,7 @@ class SupplyProductSerializer(serializers.ModelSerializer):
 
 class SupplySerializer(serializers.ModelSerializer):
     supplier_name = serializers.CharField(source='supplier.name', read_only=True)
-    products = SupplyProductSerializer(many=True, read_only=True)
+    products = SupplyProductSerializer(source='supply_products', many=True, read_only=True)
 
     class Meta:
         model = Supply
@@ -42,26 +71,6 @@ class SupplyCreateSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1)
     storage_id = serializers.IntegerField()
 
-    def validate_product_id(self, value):
-        try:
-            from inventory.models import Product
-            product = Product.objects.get(id=value)
-            if product.company != self.context['request'].user.owned_company:
-                raise serializers.ValidationError("Товар не принадлежит вашей компании")
-            return value
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Товар не найден")
-
-    def validate_storage_id(self, value):
-        try:
-            from authenticate.models import Storage
-            storage = Storage.objects.get(id=value)
-            if storage.company != self.context['request'].user.owned_company:
-                raise serializers.ValidationError("Склад не принадлежит вашей компании")
-            return value
-        except Storage.DoesNotExist:
-            raise serializers.ValidationError("Склад не найден")
-
 class SupplyCreateRequestSerializer(serializers.Serializer):
     supplier_id = serializers.IntegerField()
     delivery_date = serializers.DateTimeField()
@@ -70,4 +79,123 @@ class SupplyCreateRequestSerializer(serializers.Serializer):
     def validate_delivery_date(self, value):
         if value > timezone.now():
             raise serializers.ValidationError("Дата поставки не может быть в будущем")
-        return value
\ No newline at end of file
+        return value
+
+    def validate_products(self, value):
+        """
+        Проверяет товары и склады всех строк двумя запросами IN.
+
+        Найденные объекты кладутся в строки (product, storage), чтобы
+        view не загружала их повторно.
+        """
+        from authenticate.models import Storage
+
+        # Строка поставки — одна на товар (SupplyProduct уникален по supply, product)
+        product_ids = [item['product_id'] for item in value]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Товар не может повторяться в одной поставке")
+
+        company = self.context['request'].user.owned_company
+        products = Product.objects.in_bulk({item['product_id'] for item in value})
+        storages = Storage.objects.in_bulk({item['storage_id'] for item in value})
+
+        errors = []
+        for item in value:
+            product = products.get(item['product_id'])
+            storage = storages.get(item['storage_id'])
+            error = {}
+            if product is None:
+                error['product_id'] = ["Товар не найден"]
+            elif product.company_id != company.id:
+                error['product_id'] = ["Товар не принадлежит вашей компании"]
+            if storage is None:
+                error['storage_id'] = ["Склад не найден"]
+            elif storage.company_id != company.id:
+                error['storage_id'] = ["Склад не принадлежит вашей компании"]
+            errors.append(error)
+            item['product'] = product
+            item['storage'] = storage
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return value
+
+class StockTransferLineSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = StockTransferLine
+        fields = ('id', 'product', 'product_name', 'from_storage', 'to_storage', 'quantity')
+
+class StockTransferSerializer(serializers.ModelSerializer):
+    lines = StockTransferLineSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = StockTransfer
+        fields = ('id', 'comment', 'created_at', 'lines')
+
+class StockTransferLineCreateSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    from_storage_id = serializers.IntegerField()
+    to_storage_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+    def validate(self, attrs):
+        if attrs['from_storage_id'] == attrs['to_storage_id']:
+            raise serializers.ValidationError("Склады отправления и назначения совпадают")
+        return attrs
+
+class StockTransferCreateSerializer(serializers.Serializer):
+    comment = serializers.CharField(required=False, allow_blank=True, default='')
+    lines = StockTransferLineCreateSerializer(many=True, allow_empty=False, max_length=5000)
+
+    def validate_lines(self, value):
+        """Товары и склады всех строк проверяются двумя запросами IN."""
+        from authenticate.models import Storage
+
+        company = self.context['request'].user.owned_company
+        products = Product.objects.filter(company=company).in_bulk({item['product_id'] for item in value})
+        storages = Storage.objects.filter(company=company).in_bulk(
+            {item['from_storage_id'] for item in value} | {item['to_storage_id'] for item in value}
+        )
+
+        errors = []
+        for item in value:
+            error = {}
+            if item['product_id'] not in products:
+                error['product_id'] = ["Товар не найден"]
+            for field in ('from_storage_id', 'to_storage_id'):
+                if item[field] not in storages:
+                    error[field] = ["Склад не найден"]
+            errors.append(error)
+
+        if any(errors):
+            raise serializers.ValidationError(errors)
+        return value
+
+class StockReservationSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+    storage_name = serializers.CharField(source='storage.name', read_only=True)
+
+    class Meta:
+        model = StockReservation
+        fields = ('id', 'key', 'product', 'product_name', 'storage', 'storage_name', 'quantity', 'expires_at')
+
+class StockReservationItemSerializer(serializers.Serializer):
+    product = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1)
+
+class StockReservationCreateSerializer(serializers.Serializer):
+    products = StockReservationItemSerializer(many=True, allow_empty=False, max_length=500)
+    ttl_minutes = serializers.IntegerField(
+        required=False,
+        min_value=1,
+        max_value=MAX_RESERVATION_TTL // timedelta(minutes=1),
+        default=RESERVATION_TTL // timedelta(minutes=1)
+    )
+
+    def validate_products(self, value):
+        product_ids = [item['product'] for item in value]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Товар не может повторяться в одной брони")
+        return value
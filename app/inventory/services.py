@@ -0,0 +1,381 @@
+"""
+Единая точка изменения остатков StorageProduct.
+
+Остатки меняются только UPDATE с F()-выражениями: увеличение — increase_stock,
+списание — decrease_stock с условием quantity >= n. Чтение под списание идет
+через select_for_update (StockAllocator), поэтому параллельные запросы
+не теряют обновления и не уводят остаток в минус. Вместе с остатками
+в той же транзакции меняются счетчики Product.on_hand и Storage.used_units,
+каждое изменение попадает в журнал StockMovement (inventory.ledger),
+а затронутые строки проверяются на точку заказа (inventory.alerts).
+Активные брони StockReservation (inventory.reservations) из доступного
+количества вычитаются.
+"""
+
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from authenticate.models import Storage
+
+from .alerts import check_reorder_points
+from .ledger import record_movements
+from .models import Product, StockMovement, StockReservation, StorageProduct
+
+
+class AllocationError(Exception):
+    pass
+
+
+class StockConflictError(AllocationError):
+    """Остаток изменился параллельным запросом между чтением и списанием; запрос можно повторить."""
+
+
+class CapacityError(Exception):
+    """Поступление не помещается на склад."""
+
+
+class StockAllocator:
+    """
+    FIFO-списание остатков компании под позиции продажи.
+
+    Товары и их остатки на складах загружаются (и блокируются) фиксированным
+    числом запросов, распределение считается в памяти, а списание
+    выполняется одним условным UPDATE в save(). Движения в журнал пишет
+    create_sales, когда известны ID продаж.
+
+    Активные брони читаются после блокировки строк остатков, и
+    забронированные единицы не распределяются.
+    """
+
+    def __init__(self, company, product_ids):
+        self.company = company
+        self.products = Product.objects.in_bulk(set(product_ids))
+        self.stock = defaultdict(list)
+        self._deductions = defaultdict(int)
+
+        storage_products = StorageProduct.objects.select_for_update(of=('self',)).filter(
+            product_id__in=list(self.products),
+            storage__company=company
+        ).order_by('id')
+        for storage_product in storage_products:
+            self.stock[storage_product.product_id].append(storage_product)
+
+        self.reserved = StockReservation.objects.filter(product_id__in=list(self.products)).active().totals()
+        self.reserved_by_product = defaultdict(int)
+        for (_, product_id), quantity in self.reserved.items():
+            self.reserved_by_product[product_id] += quantity
+
+    def free(self, storage_product):
+        """Незабронированный остаток строки склада."""
+        reserved = self.reserved.get((storage_product.storage_id, storage_product.product_id), 0)
+        return max(storage_product.quantity - reserved, 0)
+
+    def available(self, product_id):
+        return sum(self.free(storage_product) for storage_product in self.stock[product_id])
+
+    def allocate(self, items):
+        """
+        Распределяет позиции [{'product': id, 'quantity': n}, ...] по складам.
+
+        Списываются либо все позиции, либо ни одной (AllocationError).
+        Возвращает список (product, quantity, [(storage_product, quantity), ...]).
+        """
+        requested = defaultdict(int)
+        for item in items:
+            product = self.products.get(item['product'])
+            if product is None:
+                raise AllocationError(f'Товар с ID {item["product"]} не найден')
+            if product.company_id != self.company.id:
+                raise AllocationError(f'Товар с ID {item["product"]} не принадлежит вашей компании')
+            requested[product.id] += item['quantity']
+
+        for product_id, quantity in requested.items():
+            # on_hand уже загружен вместе с товаром, сумма по складам — страховка от рассинхронизации
+            product = self.products[product_id]
+            available = min(product.on_hand - self.reserved_by_product[product_id], self.available(product_id))
+            if available < quantity:
+                raise AllocationError(
+                    f'Недостаточно товара "{product.name}". '
+                    f'Доступно: {available}, запрошено: {quantity}'
+                )
+
+        lines = []
+        for item in items:
+            product = self.products[item['product']]
+            remaining_quantity = item['quantity']
+            deductions = []
+
+            for storage_product in self.stock[product.id]:
+                if remaining_quantity <= 0:
+                    break
+                free = self.free(storage_product)
+                if free == 0:
+                    continue
+
+                deduct_quantity = min(remaining_quantity, free)
+                storage_product.quantity -= deduct_quantity
+                remaining_quantity -= deduct_quantity
+                self._deductions[(storage_product.storage_id, product.id)] += deduct_quantity
+                deductions.append((storage_product, deduct_quantity))
+
+            product.on_hand -= item['quantity']
+            lines.append((product, item['quantity'], deductions))
+
+        return lines
+
+    def save(self):
+        decrease_stock(self._deductions)
+        self._deductions = defaultdict(int)
+
+
+# Строк в одном UPDATE: на каждую уходит три параметра CASE, а SQLite
+# ограничивает и число параметров, и глубину выражения в запросе
+STOCK_BATCH_SIZE = 500
+
+
+def _batches(quantities):
+    items = list(quantities.items())
+    for start in range(0, len(items), STOCK_BATCH_SIZE):
+        yield dict(items[start:start + STOCK_BATCH_SIZE])
+
+
+def _rows(quantities):
+    """Строки StorageProduct пакета (с запасом: пересечение складов и товаров)."""
+    return StorageProduct.objects.filter(
+        storage_id__in={storage_id for storage_id, _ in quantities},
+        product_id__in={product_id for _, product_id in quantities}
+    )
+
+
+def _per_row(quantities):
+    """CASE: количество для строки (storage_id, product_id) пакета, NULL для лишних строк."""
+    return Case(
+        *[
+            When(storage_id=storage_id, product_id=product_id, then=Value(quantity))
+            for (storage_id, product_id), quantity in quantities.items()
+        ],
+        default=None
+    )
+
+
+def adjust_on_hand(deltas):
+    """Применяет {product_id: изменение} к Product.on_hand одним UPDATE с F()-выражением."""
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    Product.objects.filter(pk__in=list(deltas)).update(
+        on_hand=F('on_hand') + Case(
+            *[When(pk=product_id, then=Value(delta)) for product_id, delta in deltas.items()],
+            default=Value(0)
+        )
+    )
+
+
+def adjust_used_units(deltas, check_capacity=False):
+    """
+    Применяет {storage_id: изменение} к Storage.used_units одним UPDATE.
+
+    С check_capacity склады, куда поступает товар, блокируются и проверяются
+    по счетчику (без суммирования остатков); при переполнении — CapacityError.
+    """
+    deltas = {storage_id: delta for storage_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    if check_capacity:
+        incoming = [storage_id for storage_id, delta in deltas.items() if delta > 0]
+        storages = Storage.objects.select_for_update().filter(pk__in=incoming).order_by('pk')
+        overfilled = [
+            f'склад "{storage.name}": свободно {storage.free_units}, поступает {deltas[storage.pk]}'
+            for storage in storages
+            if storage.used_units + deltas[storage.pk] > storage.capacity
+        ]
+        if overfilled:
+            raise CapacityError('Недостаточно места: ' + '; '.join(overfilled))
+
+    Storage.objects.filter(pk__in=list(deltas)).update(
+        used_units=F('used_units') + Case(
+            *[When(pk=storage_id, then=Value(delta)) for storage_id, delta in deltas.items()],
+            default=Value(0)
+        )
+    )
+
+
+def delete_products(products):
+    """
+    Удаляет товары вместе с их остатками и освобождает место на складах.
+
+    Каскадное удаление StorageProduct идет в обход сервиса, поэтому остатки
+    по складам собираются до удаления и вычитаются из Storage.used_units
+    в той же транзакции.
+    """
+    product_ids = list(products.values_list('pk', flat=True))
+    with transaction.atomic():
+        freed = defaultdict(int)
+        for row in StorageProduct.objects.filter(product_id__in=product_ids).values('storage_id').annotate(
+            total=Sum('quantity')
+        ).order_by():
+            freed[row['storage_id']] -= row['total']
+
+        Product.objects.filter(pk__in=product_ids).delete()
+        adjust_used_units(freed)
+
+
+def sync_used_units(storage_ids=None):
+    """Пересчитывает Storage.used_units по StorageProduct (для правок в обход сервиса и ремонта)."""
+    totals = StorageProduct.objects.filter(storage_id=OuterRef('pk')).values('storage_id').annotate(
+        total=Sum('quantity')
+    ).values('total')
+
+    storages = Storage.objects.all()
+    if storage_ids is not None:
+        storages = storages.filter(pk__in=list(storage_ids))
+    return storages.update(used_units=Coalesce(Subquery(totals), 0))
+
+
+def sync_on_hand(product_ids=None):
+    """Пересчитывает Product.on_hand по StorageProduct (для правок в обход сервиса и ремонта)."""
+    totals = StorageProduct.objects.filter(product_id=OuterRef('pk')).values('product_id').annotate(
+        total=Sum('quantity')
+    ).values('total')
+
+    products = Product.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=list(product_ids))
+    return products.update(on_hand=Coalesce(Subquery(totals), 0))
+
+
+def increase_stock(quantities, reason=None, reference='', check_capacity=False):
+    """
+    Увеличивает остатки {(storage_id, product_id): quantity}, Product.on_hand
+    и Storage.used_units.
+
+    С reason изменения записываются в журнал StockMovement, с check_capacity
+    переполнение склада отклоняется (CapacityError) до изменения остатков.
+
+    Недостающие строки StorageProduct создаются одним bulk_create, затем
+    остатки увеличиваются UPDATE с F()-выражением — по одному на пакет
+    из STOCK_BATCH_SIZE строк.
+    """
+    quantities = {key: quantity for key, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+
+    used_deltas = defaultdict(int)
+    for (storage_id, _), quantity in quantities.items():
+        used_deltas[storage_id] += quantity
+    adjust_used_units(used_deltas, check_capacity)
+
+    StorageProduct.objects.bulk_create(
+        [
+            StorageProduct(storage_id=storage_id, product_id=product_id, quantity=0)
+            for storage_id, product_id in quantities
+        ],
+        ignore_conflicts=True
+    )
+
+    now = timezone.now()
+    for batch in _batches(quantities):
+        increment = _per_row(batch)
+        _rows(batch).alias(increment=increment).filter(increment__isnull=False).update(
+            quantity=F('quantity') + increment,
+            updated_at=now
+        )
+
+    on_hand_deltas = defaultdict(int)
+    for (_, product_id), quantity in quantities.items():
+        on_hand_deltas[product_id] += quantity
+    adjust_on_hand(on_hand_deltas)
+
+    check_reorder_points(quantities)
+    if reason:
+        record_movements(quantities, reason, reference)
+
+
+def decrease_stock(quantities, reason=None, reference=''):
+    """
+    Списывает остатки {(storage_id, product_id): quantity}, Product.on_hand
+    и Storage.used_units.
+
+    С reason изменения записываются в журнал StockMovement.
+
+    UPDATE с условием quantity >= n для каждой строки (по одному на пакет).
+    Если хотя бы одна строка не прошла условие, изменения откатываются
+    (savepoint) и выбрасывается StockConflictError.
+    """
+    quantities = {key: quantity for key, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+
+    on_hand_deltas = defaultdict(int)
+    used_deltas = defaultdict(int)
+    for (storage_id, product_id), quantity in quantities.items():
+        on_hand_deltas[product_id] -= quantity
+        used_deltas[storage_id] -= quantity
+
+    now = timezone.now()
+    with transaction.atomic():
+        for batch in _batches(quantities):
+            decrement = _per_row(batch)
+            updated = _rows(batch).filter(quantity__gte=decrement).update(
+                quantity=F('quantity') - decrement,
+                updated_at=now
+            )
+            if updated != len(batch):
+                raise StockConflictError('Остатки изменились параллельным запросом, повторите операцию')
+        adjust_on_hand(on_hand_deltas)
+        adjust_used_units(used_deltas)
+
+    deltas = {key: -quantity for key, quantity in quantities.items()}
+    check_reorder_points(deltas)
+    if reason:
+        record_movements(deltas, reason, reference)
+
+
+def transfer_stock(moves, reference=''):
+    """
+    Перемещает {(from_storage_id, to_storage_id, product_id): quantity} между складами.
+
+    Строки складов-источников блокируются одним SELECT FOR UPDATE и
+    проверяются целиком до изменений; затем остатки списываются и
+    зачисляются теми же пакетными UPDATE, что и при продаже и поставке.
+    Число запросов не зависит от количества строк (до STOCK_BATCH_SIZE).
+
+    Забронированные единицы не перемещаются.
+    """
+    outgoing = defaultdict(int)
+    incoming = defaultdict(int)
+    for (from_storage_id, to_storage_id, product_id), quantity in moves.items():
+        outgoing[(from_storage_id, product_id)] += quantity
+        incoming[(to_storage_id, product_id)] += quantity
+
+    if not outgoing:
+        return
+
+    locked = {
+        (storage_product.storage_id, storage_product.product_id): storage_product.quantity
+        for storage_product in _rows(outgoing).select_for_update()
+    }
+    reserved = StockReservation.objects.filter(
+        storage_id__in={storage_id for storage_id, _ in outgoing},
+        product_id__in={product_id for _, product_id in outgoing}
+    ).active().totals()
+    for key, quantity in reserved.items():
+        if key in locked:
+            locked[key] = max(locked[key] - quantity, 0)
+    shortages = [
+        f'склад #{storage_id}, товар #{product_id}: доступно {locked.get((storage_id, product_id), 0)}, '
+        f'требуется {quantity}'
+        for (storage_id, product_id), quantity in outgoing.items()
+        if locked.get((storage_id, product_id), 0) < quantity
+    ]
+    if shortages:
+        raise AllocationError('Недостаточно товара для перемещения: ' + '; '.join(shortages))
+
+    decrease_stock(outgoing, StockMovement.REASON_TRANSFER, reference)
+    increase_stock(incoming, StockMovement.REASON_TRANSFER, reference, check_capacity=True)
@@ -1,10 +1,26 @@
-from django.test import TestCase
+import threading
+import random
+import time
+from django.test import TestCase, TransactionTestCase
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
 from authenticate.models import User, Company, Storage
 from companies.models import Supplier
-from inventory.models import Product
+from decimal import Decimal
+from io import StringIO
+from urllib.parse import urlencode
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction, OperationalError
+from django.test.utils import CaptureQueriesContext
+from datetime import timedelta
+from django.utils import timezone
+from inventory.models import (
+    Product, StorageProduct, Supply, SupplyProduct, StockMovement, StockSnapshot, StockTransfer, StockReservation
+)
+from core.pagination import encode_cursor
+from inventory.services import StockAllocator, StockConflictError, AllocationError, sync_on_hand, sync_used_units
 
 class ProductTests(APITestCase):
     def setUp(self):
@@ -29,4 +45,533 @@ class ProductTests(APITestCase):
         }
         response = self.client.post(url, data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
-        self.assertEqual(Product.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(Product.objects.count(), 1)
+
+    def test_list_products_annotates_total_quantity(self):
+        second_storage = Storage.objects.create(
+            company=self.company,
+            name='Second Storage',
+            address='Test Address',
+            capacity=100
+        )
+        for i in range(5):
+            product = Product.objects.create(
+                company=self.company,
+                name=f'Product {i}',
+                purchase_price='10.00',
+                sale_price='20.00'
+            )
+            StorageProduct.objects.create(storage=self.storage, product=product, quantity=i)
+            StorageProduct.objects.create(storage=second_storage, product=product, quantity=1)
+
+        self.client.get(reverse('products'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('products'))
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual([product['total_quantity'] for product in response.data], [1, 2, 3, 4, 5])
+
+    def test_search_products_ranked_and_synced(self):
+        Product.objects.bulk_create([
+            Product(company=self.company, name='Кабель медный', description='', purchase_price='1.00', sale_price='2.00'),
+            Product(company=self.company, name='Розетка', description='Под медный кабель', purchase_price='1.00', sale_price='2.00'),
+            Product(company=self.company, name='Выключатель', description='', purchase_price='1.00', sale_price='2.00'),
+        ])
+        other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        other_company = Company.objects.create(owner=other_user, name='Other Company')
+        Product.objects.create(company=other_company, name='Кабель', purchase_price='1.00', sale_price='2.00')
+
+        def search(q):
+            response = self.client.get(reverse('products'), {'q': q})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            return [product['name'] for product in response.data['results']]
+
+        self.assertEqual(search('кабел'), ['Кабель медный', 'Розетка'])
+        self.assertEqual(search('медн")*'), ['Кабель медный', 'Розетка'])
+
+        Product.objects.filter(name='Выключатель').update(name='Кабель-канал')
+        Product.objects.filter(name='Розетка').delete()
+        self.assertEqual(sorted(search('кабель')), ['Кабель медный', 'Кабель-канал'])
+
+    def test_verify_on_hand_repairs_drift(self):
+        product = Product.objects.create(
+            company=self.company,
+            name='Test Product',
+            purchase_price='10.00',
+            sale_price='20.00'
+        )
+        StorageProduct.objects.create(storage=self.storage, product=product, quantity=7)
+
+        call_command('verify_on_hand', '--repair', stdout=StringIO())
+        product.refresh_from_db()
+        self.storage.refresh_from_db()
+        self.assertEqual(product.on_hand, 7)
+        self.assertEqual(self.storage.used_units, 7)
+
+    def test_delete_product_frees_storage_units(self):
+        product = Product.objects.create(
+            company=self.company, name='Удаляемый', purchase_price='10.00', sale_price='20.00'
+        )
+        StorageProduct.objects.create(storage=self.storage, product=product, quantity=7)
+        sync_used_units()
+
+        response = self.client.delete(reverse('product-detail', args=[product.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.storage.refresh_from_db()
+        self.assertEqual(self.storage.used_units, 0)
+
+class StockReservationTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company')
+        self.storage = Storage.objects.create(company=self.company, name='Склад', address='Адрес', capacity=100)
+        self.product = Product.objects.create(
+            company=self.company, name='Товар', purchase_price='10.00', sale_price='20.00'
+        )
+        StorageProduct.objects.create(storage=self.storage, product=self.product, quantity=5)
+        sync_on_hand()
+        sync_used_units()
+        self.client.force_authenticate(user=self.user)
+
+    def reserve(self, quantity):
+        return self.client.post(reverse('stock-reservations'), {
+            'products': [{'product': self.product.id, 'quantity': quantity}]
+        }, format='json')
+
+    def test_reservation_reduces_available_until_expired_or_released(self):
+        key = self.reserve(3).data['key']
+        self.assertEqual(self.reserve(3).status_code, status.HTTP_400_BAD_REQUEST)
+
+        product = self.client.get(reverse('products')).data[0]
+        self.assertEqual((product['reserved_quantity'], product['available_quantity']), (3, 2))
+
+        StockReservation.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        product = self.client.get(reverse('product-detail', args=[self.product.id])).data
+        self.assertEqual(product['available_quantity'], 5)
+        self.assertEqual(
+            self.client.get(reverse('stock-reservation-detail', args=[key])).status_code,
+            status.HTTP_404_NOT_FOUND
+        )
+
+        key = self.reserve(5).data['key']
+        response = self.client.delete(reverse('stock-reservation-detail', args=[key]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.reserve(5).status_code, status.HTTP_201_CREATED)
+
+    def test_sweeper_deletes_only_expired_in_batches(self):
+        expired = timezone.now() - timedelta(minutes=1)
+        StockReservation.objects.bulk_create([
+            StockReservation(
+                company=self.company, product=self.product, storage=self.storage, quantity=1, expires_at=expired
+            )
+            for _ in range(5)
+        ])
+        self.reserve(2)
+
+        out = StringIO()
+        call_command('sweep_reservations', '--batch-size', '2', stdout=out)
+        self.assertIn('5', out.getvalue())
+        self.assertEqual(list(StockReservation.objects.values_list('quantity', flat=True)), [2])
+
+class ProductImportTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company', inn='1234567890')
+        self.client.force_authenticate(user=self.user)
+
+    def upload(self, content, **params):
+        upload = SimpleUploadedFile('products.csv', content.encode(), content_type='text/csv')
+        url = reverse('products-import')
+        if params:
+            url += '?' + urlencode(params)
+        return self.client.post(url, {'file': upload}, format='multipart')
+
+    def test_import_reports_row_errors(self):
+        rows = ['name,purchase_price,sale_price'] + [f'Product {i},10.00,20.00' for i in range(25)]
+        rows.insert(3, 'Broken,abc,20.00')
+        # Файл больше порога уходит во временный файл — проверяем и этот путь
+        with self.settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10):
+            response = self.upload('\n'.join(rows))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['created'], response.data['failed']), (25, 1))
+        self.assertEqual(response.data['errors'][0]['row'], 4)
+        self.assertIn('purchase_price', response.data['errors'][0]['errors'])
+        self.assertEqual(Product.objects.filter(company=self.company).count(), 25)
+
+    def test_import_upserts_by_name(self):
+        Product.objects.create(company=self.company, name='Existing', purchase_price='1.00', sale_price='2.00')
+        content = 'name,description,purchase_price,sale_price\nExisting,Updated,5.00,9.00\nNew,,3.00,4.00\n'
+        response = self.upload(content, upsert=1)
+        self.assertEqual((response.data['created'], response.data['updated']), (1, 1))
+        self.assertEqual(
+            list(Product.objects.order_by('name').values_list('name', 'description', 'sale_price')),
+            [('Existing', 'Updated', Decimal('9.00')), ('New', '', Decimal('4.00'))]
+        )
+
+        response = self.upload('title,price\nX,1\n')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+class SupplyTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company', inn='1234567890')
+        self.storage = Storage.objects.create(
+            company=self.company,
+            name='Test Storage',
+            address='Test Address',
+            capacity=1000
+        )
+        self.supplier = Supplier.objects.create(company=self.company, name='Test Supplier', inn='0987654321')
+        self.product = Product.objects.create(
+            company=self.company,
+            name='Test Product',
+            purchase_price='100.00',
+            sale_price='150.00'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_create_supply_returns_lines(self):
+        data = {
+            'supplier_id': self.supplier.id,
+            'delivery_date': '2025-09-26T10:30:00Z',
+            'products': [{'product_id': self.product.id, 'quantity': 5, 'storage_id': self.storage.id}]
+        }
+        response = self.client.post(reverse('supplies'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['supplier_name'], 'Test Supplier')
+        self.assertEqual(response.data['products'][0]['product_name'], 'Test Product')
+        self.assertEqual(response.data['products'][0]['quantity'], 5)
+
+    def test_create_supply_query_count_does_not_grow_with_lines(self):
+        products = Product.objects.bulk_create(
+            Product(company=self.company, name=f'Product {i}', purchase_price='10.00', sale_price='20.00')
+            for i in range(30)
+        )
+        StorageProduct.objects.create(storage=self.storage, product=products[0], quantity=2)
+
+        def count_queries(lines):
+            data = {
+                'supplier_id': self.supplier.id,
+                'delivery_date': '2025-09-26T10:30:00Z',
+                'products': [
+                    {'product_id': product.id, 'quantity': 3, 'storage_id': self.storage.id}
+                    for product in lines
+                ]
+            }
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(reverse('supplies'), data, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.client.get(reverse('supplies'))
+        self.assertEqual(count_queries(products[:2]), count_queries(products))
+        self.assertEqual(StorageProduct.objects.get(product=products[0]).quantity, 8)
+
+    def test_create_supply_rejects_foreign_storage(self):
+        other_user = User.objects.create_user(email='other@example.com', password='testpass123')
+        other_company = Company.objects.create(owner=other_user, name='Other Company', inn='1111111111')
+        other_storage = Storage.objects.create(company=other_company, name='Other', address='Addr', capacity=10)
+        data = {
+            'supplier_id': self.supplier.id,
+            'delivery_date': '2025-09-26T10:30:00Z',
+            'products': [{'product_id': self.product.id, 'quantity': 5, 'storage_id': other_storage.id}]
+        }
+        response = self.client.post(reverse('supplies'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['products'][0]['storage_id'], ['Склад не принадлежит вашей компании'])
+        self.assertFalse(Supply.objects.exists())
+
+    def test_create_supply_rejects_duplicate_products(self):
+        second_storage = Storage.objects.create(company=self.company, name='Second', address='Addr', capacity=100)
+        data = {
+            'supplier_id': self.supplier.id,
+            'delivery_date': '2025-09-26T10:30:00Z',
+            'products': [
+                {'product_id': self.product.id, 'quantity': 2, 'storage_id': self.storage.id},
+                {'product_id': self.product.id, 'quantity': 3, 'storage_id': second_storage.id}
+            ]
+        }
+        response = self.client.post(reverse('supplies'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['products'], ['Товар не может повторяться в одной поставке'])
+        self.assertFalse(Supply.objects.exists())
+
+    def test_create_supply_rejects_overfilled_storage(self):
+        small_storage = Storage.objects.create(company=self.company, name='Small', address='Addr', capacity=10)
+        data = {
+            'supplier_id': self.supplier.id,
+            'delivery_date': '2025-09-26T10:30:00Z',
+            'products': [{'product_id': self.product.id, 'quantity': 6, 'storage_id': small_storage.id}]
+        }
+        response = self.client.post(reverse('supplies'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(reverse('supplies'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('свободно 4, поступает 6', response.data['detail'])
+        self.assertEqual(Supply.objects.count(), 1)
+
+        storage = self.client.get(reverse('storage-detail', args=[small_storage.id])).data
+        self.assertEqual((storage['used_units'], storage['free_units'], storage['utilization']), (6, 4, 60.0))
+
+    def test_list_supplies_by_date_with_cursor(self):
+        for day in range(1, 6):
+            supply = Supply.objects.create(
+                company=self.company,
+                supplier=self.supplier,
+                delivery_date=f'2025-09-0{day}T10:00:00Z'
+            )
+            SupplyProduct.objects.create(supply=supply, product=self.product, quantity=day, purchase_price='100.00')
+
+        seen = []
+        params = {'start_date': '2025-09-02', 'end_date': '2025-09-04', 'page_size': 2}
+        while True:
+            response = self.client.get(reverse('supplies'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            seen.extend(supply['products'][0]['quantity'] for supply in response.data['results'])
+            if not response.data['next']:
+                break
+            params['cursor'] = response.data['next']
+
+        self.assertEqual(seen, [4, 3, 2])
+
+    def test_list_supplies_rejects_malformed_cursor(self):
+        for values in (['garbage', 1], [{'a': 1}, 1], [None, 1], ['2025-09-01T10:00:00Z']):
+            response = self.client.get(reverse('supplies'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['detail'], 'Некорректный курсор')
+
+    def test_list_supplies_query_count_is_constant(self):
+        def add_supplies(count):
+            for _ in range(count):
+                supply = Supply.objects.create(
+                    company=self.company,
+                    supplier=self.supplier,
+                    delivery_date='2025-09-26T10:30:00Z'
+                )
+                SupplyProduct.objects.create(supply=supply, product=self.product, quantity=1, purchase_price='100.00')
+
+        def count_queries():
+            with CaptureQueriesContext(connection) as context:
+                self.client.get(reverse('supplies'))
+            return len(context.captured_queries)
+
+        add_supplies(1)
+        self.client.get(reverse('supplies'))
+        baseline = count_queries()
+        add_supplies(5)
+        self.assertEqual(count_queries(), baseline)
+
+class StockLedgerTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company', inn='1234567890')
+        self.storage = Storage.objects.create(company=self.company, name='Test Storage', address='Test Address', capacity=1000)
+        self.supplier = Supplier.objects.create(company=self.company, name='Test Supplier', inn='0987654321')
+        self.product = Product.objects.create(
+            company=self.company,
+            name='Test Product',
+            purchase_price='100.00',
+            sale_price='150.00'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def stock_at(self, day):
+        response = self.client.get(reverse('stock-at'), {'date': day})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['quantity'] for row in response.data['results']]
+
+    def test_stock_at_combines_snapshot_and_movements(self):
+        for created_at, delta in (('2025-09-01T10:00:00Z', 10), ('2025-09-03T10:00:00Z', -3), ('2025-09-06T10:00:00Z', 5)):
+            StockMovement.objects.create(
+                storage=self.storage, product=self.product, delta=delta,
+                reason=StockMovement.REASON_ADJUSTMENT, created_at=created_at
+            )
+        StockSnapshot.objects.create(
+            storage=self.storage, product=self.product, quantity=7, taken_at='2025-09-04T00:00:00Z'
+        )
+        # Движения до снимка уже учтены в нем и не читаются повторно
+        StockMovement.objects.filter(created_at__lt='2025-09-04T00:00:00Z').update(delta=1000)
+
+        self.assertEqual(self.stock_at('2025-08-31'), [])
+        self.assertEqual(self.stock_at('2025-09-04'), [7])
+        self.assertEqual(self.stock_at('2025-09-10'), [12])
+
+    def test_supply_is_recorded_in_ledger(self):
+        data = {
+            'supplier_id': self.supplier.id,
+            'delivery_date': '2025-09-26T10:30:00Z',
+            'products': [{'product_id': self.product.id, 'quantity': 5, 'storage_id': self.storage.id}]
+        }
+        response = self.client.post(reverse('supplies'), data, format='json')
+        movement = StockMovement.objects.get()
+        self.assertEqual((movement.delta, movement.reason, movement.reference), (5, 'supply', f'supply:{response.data["id"]}'))
+
+        call_command('snapshot_stock', stdout=StringIO())
+        self.assertEqual(StockSnapshot.objects.get().quantity, 5)
+        self.assertEqual(self.stock_at('2999-01-01'), [5])
+
+class MultiStorageTestCase(APITestCase):
+    """Три склада, 40 товаров по 10 единиц на первом; строки перемещений для тестов."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company', inn='1234567890')
+        self.storages = [
+            Storage.objects.create(company=self.company, name=f'Storage {i}', address='Test Address', capacity=1000)
+            for i in range(3)
+        ]
+        self.products = Product.objects.bulk_create(
+            Product(company=self.company, name=f'Product {i}', purchase_price='10.00', sale_price='20.00')
+            for i in range(40)
+        )
+        StorageProduct.objects.bulk_create(
+            StorageProduct(storage=self.storages[0], product=product, quantity=10)
+            for product in self.products
+        )
+        sync_on_hand()
+        sync_used_units()
+        self.client.force_authenticate(user=self.user)
+
+    def transfer(self, lines):
+        return self.client.post(reverse('stock-transfers'), {'lines': lines}, format='json')
+
+    def line(self, product, quantity, to=1):
+        return {
+            'product_id': product.id,
+            'from_storage_id': self.storages[0].id,
+            'to_storage_id': self.storages[to].id,
+            'quantity': quantity
+        }
+
+class StockTransferTests(MultiStorageTestCase):
+    def test_transfer_moves_stock_in_constant_queries(self):
+        def count_queries(lines):
+            with CaptureQueriesContext(connection) as context:
+                response = self.transfer(lines)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.client.get(reverse('stock-transfers'))
+        small = count_queries([self.line(product, 1) for product in self.products[:2]])
+        large = count_queries([self.line(product, 2, to=1 + i % 2) for i, product in enumerate(self.products)])
+        self.assertEqual(small, large)
+
+        self.assertEqual(
+            list(StorageProduct.objects.filter(product=self.products[0]).order_by('storage_id').values_list('quantity', flat=True)),
+            [7, 3]
+        )
+        self.assertEqual(
+            list(Storage.objects.order_by('id').values_list('used_units', flat=True)),
+            [400 - 2 - 80, 2 + 40, 40]
+        )
+        self.assertEqual(StockMovement.objects.filter(reason='transfer').count(), 2 * (2 + 40))
+
+    def test_transfer_rejects_shortage_atomically(self):
+        response = self.transfer([self.line(self.products[0], 5), self.line(self.products[1], 11)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('доступно 10, требуется 11', response.data['detail'])
+        self.assertFalse(StockTransfer.objects.exists())
+        self.assertEqual(StorageProduct.objects.filter(storage=self.storages[0], quantity=10).count(), 40)
+
+class StockValuationTests(MultiStorageTestCase):
+    def test_valuation_is_exact_by_storage_and_product(self):
+        Product.objects.filter(pk=self.products[0].pk).update(purchase_price='0.10')
+        Product.objects.filter(pk=self.products[1].pk).update(purchase_price='0.20')
+        self.transfer([self.line(self.products[0], 3), self.line(self.products[1], 3, to=2)])
+
+        by_storage = self.client.get(reverse('valuation')).data
+        self.assertEqual(by_storage['total_units'], 400)
+        self.assertEqual(by_storage['total_value'], '3803.00')
+        self.assertEqual(
+            [(row['storage'], row['value']) for row in by_storage['results']],
+            [(self.storages[0].id, '3802.10'), (self.storages[2].id, '0.60'), (self.storages[1].id, '0.30')]
+        )
+
+        by_product = self.client.get(reverse('valuation'), {'group_by': 'product', 'storage': self.storages[0].id}).data
+        self.assertEqual(by_product['results'][-1], {
+            'product': self.products[0].id, 'product_name': 'Product 0', 'units': 7, 'value': '0.70'
+        })
+
+class StorageProductListTests(MultiStorageTestCase):
+    def test_storage_products_filtered_and_paged_in_one_query(self):
+        self.transfer([self.line(product, 4) for product in self.products[:5]])
+        StorageProduct.objects.filter(product=self.products[0]).update(updated_at='2020-01-01T00:00:00Z')
+
+        url = reverse('storage-products')
+        params = {'storage': self.storages[0].id, 'max_qty': 6, 'page_size': 2}
+        self.client.get(url)
+        seen = []
+        while True:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(url, params)
+            self.assertEqual(len(context.captured_queries), 1)
+            seen.extend((row['product_name'], row['storage_name']) for row in response.data['results'])
+            if not response.data['next']:
+                break
+            params['cursor'] = response.data['next']
+
+        self.assertEqual(seen, [(f'Product {i}', 'Storage 0') for i in range(5)])
+
+        response = self.client.get(url, {'updated_since': '2021-01-01', 'product': self.products[0].id})
+        self.assertEqual(response.data['results'], [])
+        response = self.client.get(url, {'updated_since': 'вчера'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        for values in ([[1]], ['abc']):
+            response = self.client.get(url, {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data['detail'], 'Некорректный курсор')
+
+class ConcurrentStockTests(TransactionTestCase):
+    writers = 50
+    stock = 30
+
+    def setUp(self):
+        user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=user, name='Test Company', inn='1234567890')
+        storage = Storage.objects.create(company=self.company, name='Test Storage', address='Test Address', capacity=100)
+        self.product = Product.objects.create(
+            company=self.company,
+            name='Test Product',
+            purchase_price='10.00',
+            sale_price='20.00'
+        )
+        StorageProduct.objects.create(storage=storage, product=self.product, quantity=self.stock)
+        sync_on_hand()
+        sync_used_units()
+
+    def sell_one(self, results, start):
+        start.wait()
+        attempt = 0
+        try:
+            while True:
+                try:
+                    with transaction.atomic():
+                        allocator = StockAllocator(self.company, [self.product.id])
+                        allocator.allocate([{'product': self.product.id, 'quantity': 1}])
+                        allocator.save()
+                    results.append('sold')
+                    return
+                except (StockConflictError, OperationalError):
+                    # SQLite в тестах блокирует таблицу целиком: экспоненциальная пауза вместо спина
+                    attempt += 1
+                    time.sleep(random.uniform(0, 0.005 * 2 ** min(attempt, 6)))
+                except AllocationError:
+                    results.append('rejected')
+                    return
+        finally:
+            connection.close()
+
+    def test_no_oversell_under_concurrent_writers(self):
+        results = []
+        start = threading.Barrier(self.writers)
+        threads = [threading.Thread(target=self.sell_one, args=(results, start)) for _ in range(self.writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(results.count('sold'), self.stock)
+        self.assertEqual(results.count('rejected'), self.writers - self.stock)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, 0)
+        self.assertEqual(StorageProduct.objects.get(product=self.product).quantity, 0)
@@ -1,9 +1,30 @@
 from django.urls import path
-from .views import ProductView, ProductDetailView, StorageProductView, SupplyView
+from .views import (
+    ProductView,
+    ProductImportView,
+    ProductDetailView,
+    StorageProductView,
+    StorageProductDetailView,
+    SupplyView,
+    StockAtView,
+    StockTransferView,
+    StockReservationView,
+    StockReservationDetailView,
+    ValuationView,
+    StockAlertView
+)
 
 urlpatterns = [
     path('products/', ProductView.as_view(), name='products'),
+    path('products/import/', ProductImportView.as_view(), name='products-import'),
     path('products/<int:pk>/', ProductDetailView.as_view(), name='product-detail'),
     path('storage-products/', StorageProductView.as_view(), name='storage-products'),
+    path('storage-products/<int:pk>/', StorageProductDetailView.as_view(), name='storage-product-detail'),
     path('supplies/', SupplyView.as_view(), name='supplies'),
+    path('transfers/', StockTransferView.as_view(), name='stock-transfers'),
+    path('reservations/', StockReservationView.as_view(), name='stock-reservations'),
+    path('reservations/<uuid:key>/', StockReservationDetailView.as_view(), name='stock-reservation-detail'),
+    path('valuation/', ValuationView.as_view(), name='valuation'),
+    path('stock-at/', StockAtView.as_view(), name='stock-at'),
+    path('alerts/', StockAlertView.as_view(), name='stock-alerts'),
 ]
\ No newline at end of file
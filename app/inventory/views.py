@@ -1,25 +1,80 @@
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
 from rest_framework import status, permissions
 from rest_framework.views import APIView
+from rest_framework.parsers import MultiPartParser
 from rest_framework.response import Response
 from django.db import transaction
-from django.db.models import Sum
+from django.db.models import F, IntegerField, Prefetch, Sum
+from django.db.models.functions import Cast, Round
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 
-from .models import Product, StorageProduct, Supply, SupplyProduct
+from .models import (
+    Product,
+    StorageProduct,
+    StockAlert,
+    StockMovement,
+    StockReservation,
+    StockTransfer,
+    StockTransferLine,
+    Supply,
+    SupplyProduct
+)
+from .costing import open_layers
+from .imports import ImportFormatError, import_products
+from .ledger import stock_at
+from .reservations import release, reserve
+from .search import search_products
+from .services import (
+    AllocationError,
+    CapacityError,
+    StockConflictError,
+    delete_products,
+    increase_stock,
+    transfer_stock
+)
 from .serializers import (
     ProductSerializer,
     StorageProductSerializer,
+    StockAlertSerializer,
     SupplySerializer,
     SupplyCreateRequestSerializer,
-    SupplyProductSerializer
+    SupplyProductSerializer,
+    StockTransferSerializer,
+    StockTransferCreateSerializer,
+    StockReservationSerializer,
+    StockReservationCreateSerializer
 )
 from companies.models import Supplier
-from authenticate.permissions import IsCompanyMember
 from authenticate.models import Storage
+from authenticate.permissions import IsCompanyMember
+from companies.idempotency import idempotent
+from companies.stats import record_supply
+from core.dates import date_range_bounds, parse_moment
+from core.pagination import paginate_by_cursor
+
+def supplies_with_lines():
+    return Supply.objects.select_related('supplier').prefetch_related(
+        Prefetch('supply_products', queryset=SupplyProduct.objects.select_related('product'))
+    )
 
 class ProductView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='q',
+                description='Полнотекстовый поиск по названию и описанию. '
+                            'Ответ постраничный, по убыванию релевантности',
+                type=str
+            ),
+            OpenApiParameter(name='page', description='Номер страницы (с q)', type=int),
+            OpenApiParameter(name='page_size', description='Размер страницы (с q)', type=int),
+        ]
+    )
     def get(self, request):
         if not hasattr(request.user, 'owned_company'):
             return Response(
@@ -27,10 +82,38 @@ class ProductView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        products = Product.objects.filter(company=request.user.owned_company)
+        if 'q' in request.GET:
+            return self.search(request)
+
+        products = Product.objects.with_total_quantity().filter(company=request.user.owned_company)
         serializer = ProductSerializer(products, many=True)
         return Response(serializer.data)
 
+    def search(self, request):
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+            page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+        except ValueError:
+            return Response(
+                {'detail': 'page и page_size должны быть числами'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        count, ids = search_products(
+            request.user.owned_company,
+            request.GET['q'],
+            offset=(page - 1) * page_size,
+            limit=page_size
+        )
+        products = Product.objects.with_total_quantity().in_bulk(ids)
+
+        return Response({
+            'count': count,
+            'total_pages': (count + page_size - 1) // page_size,
+            'current_page': page,
+            'results': ProductSerializer([products[pk] for pk in ids], many=True).data
+        })
+
     def post(self, request):
         if not hasattr(request.user, 'owned_company'):
             return Response(
@@ -44,12 +127,55 @@ class ProductView(APIView):
             return Response(ProductSerializer(product).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class ProductImportView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+    parser_classes = [MultiPartParser]
+
+    @extend_schema(
+        request={
+            'multipart/form-data': {
+                'type': 'object',
+                'properties': {'file': {'type': 'string', 'format': 'binary'}}
+            }
+        },
+        parameters=[
+            OpenApiParameter(
+                name='upsert',
+                description='Обновлять существующие товары с тем же названием (1/0)',
+                type=bool
+            ),
+        ]
+    )
+    @transaction.atomic
+    def post(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response(
+                {'detail': 'Загрузите CSV-файл в поле file'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        upsert = request.GET.get('upsert', '').lower() in ('1', 'true', 'yes')
+        try:
+            report = import_products(request.user.owned_company, upload, upsert=upsert)
+        except ImportFormatError as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(report)
+
 class ProductDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
     def get_object(self, pk, user):
         try:
-            product = Product.objects.get(pk=pk)
+            product = Product.objects.with_total_quantity().get(pk=pk)
             if hasattr(user, 'owned_company') and product.company == user.owned_company:
                 return product
             return None
@@ -88,12 +214,35 @@ class ProductDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        product.delete()
+        delete_products(Product.objects.filter(pk=product.pk))
         return Response({'detail': 'Товар удален'}, status=status.HTTP_204_NO_CONTENT)
 
 class StorageProductView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
+    filters = {
+        'storage': 'storage_id',
+        'product': 'product_id',
+        'min_qty': 'quantity__gte',
+        'max_qty': 'quantity__lte',
+    }
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='storage', description='ID склада', type=int),
+            OpenApiParameter(name='product', description='ID товара', type=int),
+            OpenApiParameter(name='min_qty', description='Остаток не меньше', type=int),
+            OpenApiParameter(name='max_qty', description='Остаток не больше', type=int),
+            OpenApiParameter(
+                name='updated_since',
+                description='Изменены не раньше (YYYY-MM-DD или ISO 8601)',
+                type=str
+            ),
+            OpenApiParameter(name='cursor', description='Курсор следующей страницы (next)', type=str),
+            OpenApiParameter(name='page_size', description='Размер страницы (до 500)', type=int),
+        ],
+        responses={200: StorageProductSerializer(many=True)}
+    )
     def get(self, request):
         if not hasattr(request.user, 'owned_company'):
             return Response(
@@ -101,15 +250,122 @@ class StorageProductView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        storage_products = StorageProduct.objects.filter(
+        # Названия склада и товара приходят тем же запросом, страница — один SELECT
+        storage_products = StorageProduct.objects.select_related('storage', 'product').filter(
             storage__company=request.user.owned_company
         )
-        serializer = StorageProductSerializer(storage_products, many=True)
-        return Response(serializer.data)
+
+        try:
+            for param, lookup in self.filters.items():
+                if request.GET.get(param):
+                    storage_products = storage_products.filter(**{lookup: int(request.GET[param])})
+
+            if request.GET.get('updated_since'):
+                storage_products = storage_products.filter(
+                    updated_at__gte=parse_moment(request.GET['updated_since'])
+                )
+
+            page_size = min(max(int(request.GET.get('page_size', 100)), 1), 500)
+            results, next_cursor = paginate_by_cursor(
+                storage_products,
+                ('id',),
+                cursor=request.GET.get('cursor'),
+                page_size=page_size
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'next': next_cursor,
+            'results': StorageProductSerializer(results, many=True).data
+        })
+
+class StorageProductDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    def get_object(self, pk, user):
+        try:
+            storage_product = StorageProduct.objects.select_related('storage', 'product').get(pk=pk)
+            if hasattr(user, 'owned_company') and storage_product.storage.company == user.owned_company:
+                return storage_product
+            return None
+        except StorageProduct.DoesNotExist:
+            return None
+
+    def get(self, request, pk):
+        storage_product = self.get_object(pk, request.user)
+        if not storage_product:
+            return Response(
+                {'detail': 'Товар на складе не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(StorageProductSerializer(storage_product).data)
+
+    def put(self, request, pk):
+        storage_product = self.get_object(pk, request.user)
+        if not storage_product:
+            return Response(
+                {'detail': 'Товар на складе не найден'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = StorageProductSerializer(storage_product, data=request.data, partial=True)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+class StockAlertView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='since', description='ID последнего полученного оповещения', type=int),
+            OpenApiParameter(name='limit', description='Размер страницы (до 500)', type=int),
+        ]
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        try:
+            since = int(request.GET.get('since', 0))
+            limit = min(max(int(request.GET.get('limit', 100)), 1), 500)
+        except ValueError:
+            return Response(
+                {'detail': 'since и limit должны быть числами'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Лента читается по индексу (company, id) начиная с курсора
+        alerts = list(
+            StockAlert.objects.select_related('storage', 'product').filter(
+                company=request.user.owned_company,
+                id__gt=since
+            ).order_by('id')[:limit]
+        )
+
+        return Response({
+            'since': alerts[-1].id if alerts else since,
+            'results': StockAlertSerializer(alerts, many=True).data
+        })
 
 class SupplyView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='start_date', description='Поставки начиная с даты (YYYY-MM-DD)', type=str),
+            OpenApiParameter(name='end_date', description='Поставки по дату включительно (YYYY-MM-DD)', type=str),
+            OpenApiParameter(name='supplier', description='ID поставщика', type=int),
+            OpenApiParameter(name='cursor', description='Курсор следующей страницы (next)', type=str),
+            OpenApiParameter(name='page_size', description='Размер страницы (до 100)', type=int),
+        ],
+        responses={200: SupplySerializer(many=True)}
+    )
     def get(self, request):
         if not hasattr(request.user, 'owned_company'):
             return Response(
@@ -117,11 +373,47 @@ class SupplyView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        supplies = Supply.objects.filter(company=request.user.owned_company)
-        serializer = SupplySerializer(supplies, many=True)
-        return Response(serializer.data)
+        # Страница: поставки с поставщиком одним запросом и строки с товарами вторым
+        supplies = supplies_with_lines().filter(company=request.user.owned_company)
 
+        try:
+            start, end = date_range_bounds(request.GET.get('start_date'), request.GET.get('end_date'))
+            if start:
+                supplies = supplies.filter(delivery_date__gte=start)
+            if end:
+                supplies = supplies.filter(delivery_date__lt=end)
+            if request.GET.get('supplier'):
+                supplies = supplies.filter(supplier_id=int(request.GET['supplier']))
+
+            page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+            results, next_cursor = paginate_by_cursor(
+                supplies,
+                ('-delivery_date', '-id'),
+                cursor=request.GET.get('cursor'),
+                page_size=page_size
+            )
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'next': next_cursor,
+            'results': SupplySerializer(results, many=True).data
+        })
+
+    @extend_schema(
+        request=SupplyCreateRequestSerializer,
+        responses={201: SupplySerializer},
+        parameters=[
+            OpenApiParameter(
+                name='Idempotency-Key',
+                location=OpenApiParameter.HEADER,
+                description='Ключ для безопасного повтора запроса',
+                type=str
+            ),
+        ]
+    )
     @transaction.atomic
+    @idempotent
     def post(self, request):
         if not hasattr(request.user, 'owned_company'):
             return Response(
@@ -129,7 +421,7 @@ class SupplyView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        serializer = SupplyCreateRequestSerializer(data=request.data)
+        serializer = SupplyCreateRequestSerializer(data=request.data, context={'request': request})
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -154,48 +446,305 @@ class SupplyView(APIView):
             delivery_date=data['delivery_date']
         )
 
+        # Товары и склады уже загружены валидатором двумя запросами IN
         total_amount = 0
         supply_products = []
+        received = defaultdict(int)
 
         for item in data['products']:
-            try:
-                product = Product.objects.get(id=item['product_id'])
-                storage = Storage.objects.get(id=item['storage_id'])
+            product = item['product']
+            received[(item['storage'].id, product.id)] += item['quantity']
+            supply_products.append(SupplyProduct(
+                supply=supply,
+                product=product,
+                quantity=item['quantity'],
+                purchase_price=product.purchase_price
+            ))
+            total_amount += product.purchase_price * item['quantity']
 
-                if product.company != request.user.owned_company:
-                    raise Product.DoesNotExist
+        try:
+            increase_stock(received, StockMovement.REASON_SUPPLY, f'supply:{supply.pk}', check_capacity=True)
+        except CapacityError as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        SupplyProduct.objects.bulk_create(supply_products)
+        open_layers(supply, supply_products)
 
-                if storage.company != request.user.owned_company:
-                    raise Storage.DoesNotExist
+        supply.total_amount = total_amount
+        supply.save()
+        record_supply(supply, supply_products)
 
-                storage_product, created = StorageProduct.objects.get_or_create(
-                    storage=storage,
-                    product=product,
-                    defaults={'quantity': 0}
-                )
-                storage_product.quantity += item['quantity']
-                storage_product.save()
-
-                supply_product = SupplyProduct(
-                    supply=supply,
-                    product=product,
-                    quantity=item['quantity'],
-                    purchase_price=product.purchase_price
-                )
-                supply_products.append(supply_product)
+        supply = supplies_with_lines().get(pk=supply.pk)
+        return Response(SupplySerializer(supply).data, status=status.HTTP_201_CREATED)
 
-                total_amount += product.purchase_price * item['quantity']
+def transfers_with_lines():
+    return StockTransfer.objects.prefetch_related(
+        Prefetch('lines', queryset=StockTransferLine.objects.select_related('product'))
+    )
 
-            except (Product.DoesNotExist, Storage.DoesNotExist):
-                supply.delete()
-                return Response(
-                    {'detail': f'Товар или склад не найдены'},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
+class StockTransferView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
-        SupplyProduct.objects.bulk_create(supply_products)
+    @extend_schema(responses={200: StockTransferSerializer(many=True)})
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
 
-        supply.total_amount = total_amount
-        supply.save()
+        transfers = transfers_with_lines().filter(company=request.user.owned_company).order_by('-id')
+        return Response(StockTransferSerializer(transfers, many=True).data)
+
+    @extend_schema(
+        request=StockTransferCreateSerializer,
+        responses={201: StockTransferSerializer},
+        parameters=[
+            OpenApiParameter(
+                name='Idempotency-Key',
+                location=OpenApiParameter.HEADER,
+                description='Ключ для безопасного повтора запроса',
+                type=str
+            ),
+        ]
+    )
+    @transaction.atomic
+    @idempotent
+    def post(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = StockTransferCreateSerializer(data=request.data, context={'request': request})
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        transfer = StockTransfer.objects.create(company=request.user.owned_company, comment=data['comment'])
+
+        moves = defaultdict(int)
+        for line in data['lines']:
+            moves[(line['from_storage_id'], line['to_storage_id'], line['product_id'])] += line['quantity']
+
+        try:
+            transfer_stock(moves, f'transfer:{transfer.pk}')
+        except StockConflictError as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+        except (AllocationError, CapacityError) as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        StockTransferLine.objects.bulk_create([
+            StockTransferLine(
+                transfer=transfer,
+                product_id=product_id,
+                from_storage_id=from_storage_id,
+                to_storage_id=to_storage_id,
+                quantity=quantity
+            )
+            for (from_storage_id, to_storage_id, product_id), quantity in moves.items()
+        ])
+
+        transfer = transfers_with_lines().get(pk=transfer.pk)
+        return Response(StockTransferSerializer(transfer).data, status=status.HTTP_201_CREATED)
+
+class StockReservationView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(
+        request=StockReservationCreateSerializer,
+        responses={201: StockReservationSerializer(many=True)},
+        examples=[
+            OpenApiExample(
+                'Example',
+                value={
+                    "products": [{"product": 1, "quantity": 2}],
+                    "ttl_minutes": 15
+                }
+            )
+        ]
+    )
+    @transaction.atomic
+    def post(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = StockReservationCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(SupplySerializer(supply).data, status=status.HTTP_201_CREATED)
\ No newline at end of file
+        data = serializer.validated_data
+        try:
+            reservations = reserve(
+                request.user.owned_company,
+                data['products'],
+                ttl=timedelta(minutes=data['ttl_minutes'])
+            )
+        except AllocationError as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        reservations = StockReservation.objects.select_related('product', 'storage').filter(
+            key=reservations[0].key
+        ).order_by('id')
+        return Response({
+            'key': reservations[0].key,
+            'expires_at': reservations[0].expires_at,
+            'lines': StockReservationSerializer(reservations, many=True).data
+        }, status=status.HTTP_201_CREATED)
+
+class StockReservationDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(responses={200: StockReservationSerializer(many=True)})
+    def get(self, request, key):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        reservations = list(StockReservation.objects.select_related('product', 'storage').filter(
+            company=request.user.owned_company,
+            key=key
+        ).active().order_by('id'))
+        if not reservations:
+            return Response({'detail': 'Бронь не найдена или истекла'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response({
+            'key': key,
+            'expires_at': reservations[0].expires_at,
+            'lines': StockReservationSerializer(reservations, many=True).data
+        })
+
+    def delete(self, request, key):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        if not release(request.user.owned_company, key):
+            return Response({'detail': 'Бронь не найдена'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ValuationView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    groupings = {
+        'storage': ('storage_id', 'storage__name'),
+        'product': ('product_id', 'product__name'),
+    }
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='group_by', description='Группировка: storage или product', type=str),
+            OpenApiParameter(name='storage', description='ID склада', type=int),
+        ]
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        group_by = request.GET.get('group_by', 'storage')
+        if group_by not in self.groupings:
+            return Response(
+                {'detail': 'group_by должен быть storage или product'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        rows = StorageProduct.objects.filter(storage__company=request.user.owned_company, quantity__gt=0)
+        if request.GET.get('storage'):
+            try:
+                rows = rows.filter(storage_id=int(request.GET['storage']))
+            except ValueError:
+                return Response({'detail': 'Некорректный ID склада'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Стоимость считается в копейках целочисленным SUM: на SQLite десятичные
+        # числа хранятся как REAL, и сумма произведений в них теряла бы точность
+        price_cents = Cast(Round(F('product__purchase_price') * 100), IntegerField())
+        id_field, name_field = self.groupings[group_by]
+        groups = rows.values(id_field, name_field).annotate(
+            units=Sum('quantity'),
+            value_cents=Sum(F('quantity') * price_cents)
+        ).order_by('-value_cents', id_field)
+
+        cents = Decimal('0.01')
+        groups = list(groups)
+        results = [
+            {
+                group_by: group[id_field],
+                f'{group_by}_name': group[name_field],
+                'units': group['units'],
+                'value': str(group['value_cents'] * cents)
+            }
+            for group in groups
+        ]
+
+        return Response({
+            'group_by': group_by,
+            'total_units': sum(group['units'] for group in groups),
+            'total_value': str(sum(group['value_cents'] for group in groups) * cents),
+            'results': results
+        })
+
+class StockAtView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='date', description='Дата (YYYY-MM-DD), остаток на конец дня', type=str, required=True),
+            OpenApiParameter(name='storage', description='ID склада', type=int),
+            OpenApiParameter(name='product', description='ID товара', type=int),
+        ]
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        value = request.GET.get('date')
+        if not value:
+            return Response({'detail': 'Укажите дату'}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {}
+        try:
+            _, moment = date_range_bounds(None, value)
+            for param in ('storage', 'product'):
+                if request.GET.get(param):
+                    filters[f'{param}_id'] = int(request.GET[param])
+        except ValueError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+
+        company = request.user.owned_company
+        snapshot_at, levels = stock_at(company, moment, **filters)
+
+        storages = Storage.objects.filter(company=company).in_bulk({storage_id for storage_id, _ in levels})
+        products = Product.objects.filter(company=company).in_bulk({product_id for _, product_id in levels})
+        results = [
+            {
+                'storage': storage_id,
+                'storage_name': storages[storage_id].name,
+                'product': product_id,
+                'product_name': products[product_id].name,
+                'quantity': quantity
+            }
+            for (storage_id, product_id), quantity in sorted(levels.items())
+        ]
+
+        return Response({
+            'date': value,
+            'snapshot_at': snapshot_at,
+            'results': results
+        })
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Sale, ProductSale
+from .models import Sale, ProductSale, SalesDailyRollup
 
 class ProductSaleInline(admin.TabularInline):
     model = ProductSale
@@ -21,4 +21,10 @@ class ProductSaleAdmin(admin.ModelAdmin):
     list_display = ('id', 'sale', 'product', 'quantity', 'sale_price')
     list_filter = ('sale__company', 'sale')
     search_fields = ('product__name', 'sale__buyer_name')
-    readonly_fields = ('created_at', 'updated_at')
\ No newline at end of file
+    readonly_fields = ('created_at', 'updated_at')
+
+@admin.register(SalesDailyRollup)
+class SalesDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ('id', 'company', 'date', 'product', 'units', 'revenue', 'sale_count')
+    list_filter = ('company', 'date')
+    readonly_fields = ('company', 'date', 'product', 'units', 'revenue', 'sale_count')
\ No newline at end of file
@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Sum
+from django.db.models.functions import TruncDate
+
+from sales.models import ProductSale, SalesDailyRollup
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает дневные итоги продаж (SalesDailyRollup) по сырым продажам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--company', type=int, help='ID компании (по умолчанию — все)')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        product_sales = ProductSale.objects.all()
+        rollups = SalesDailyRollup.objects.all()
+        if options['company']:
+            product_sales = product_sales.filter(sale__company_id=options['company'])
+            rollups = rollups.filter(company_id=options['company'])
+
+        aggregates = product_sales.values(
+            company_id=F('sale__company_id'),
+            date=TruncDate('sale__sale_date'),
+            product_ref=F('product_id')
+        ).annotate(
+            total_units=Sum('quantity'),
+            total_revenue=Sum(ExpressionWrapper(
+                F('quantity') * F('sale_price'),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )),
+            total_sales=Count('id')
+        ).order_by()
+
+        created = 0
+        with transaction.atomic():
+            rollups.delete()
+
+            batch = []
+            for row in aggregates.iterator(chunk_size=options['batch_size']):
+                batch.append(SalesDailyRollup(
+                    company_id=row['company_id'],
+                    date=row['date'],
+                    product_id=row['product_ref'],
+                    units=row['total_units'],
+                    revenue=row['total_revenue'],
+                    sale_count=row['total_sales']
+                ))
+                if len(batch) >= options['batch_size']:
+                    SalesDailyRollup.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+
+            SalesDailyRollup.objects.bulk_create(batch)
+            created += len(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано записей: {created}'))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='productsale',
+            index=models.Index(fields=['product', 'sale'], name='productsale_product_sale_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['company', 'sale_date'], name='sale_company_date_idx'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:42
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0003_alter_company_inn'),
+        ('inventory', '0001_initial'),
+        ('sales', '0002_sale_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(verbose_name='Дата')),
+                ('units', models.PositiveIntegerField(default=0, verbose_name='Продано единиц')),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Выручка')),
+                ('sale_count', models.PositiveIntegerField(default=0, verbose_name='Количество продаж')),
+                ('company', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='authenticate.company', verbose_name='Компания')),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollups', to='inventory.product', verbose_name='Товар')),
+            ],
+            options={
+                'verbose_name': 'Дневной итог продаж',
+                'verbose_name_plural': 'Дневные итоги продаж',
+                'unique_together': {('company', 'date', 'product')},
+            },
+        ),
+    ]
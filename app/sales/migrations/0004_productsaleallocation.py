@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0003_alter_company_inn'),
+        ('sales', '0003_salesdailyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductSaleAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Списано со склада')),
+                ('product_sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='sales.productsale', verbose_name='Товар в продаже')),
+                ('storage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sale_allocations', to='authenticate.storage', verbose_name='Склад')),
+            ],
+            options={
+                'verbose_name': 'Списание товара продажи со склада',
+                'verbose_name_plural': 'Списания товаров продаж со складов',
+            },
+        ),
+    ]
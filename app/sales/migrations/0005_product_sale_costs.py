@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:46
+
+from django.db import migrations, models
+from django.db.models import DecimalField, ExpressionWrapper, F, OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_cost_amount(apps, schema_editor):
+    """Прошлые продажи оцениваются по текущей цене закупки товара."""
+    ProductSale = apps.get_model('sales', 'ProductSale')
+    Product = apps.get_model('inventory', 'Product')
+
+    purchase_price = Product.objects.filter(pk=OuterRef('product_id')).values('purchase_price')[:1]
+    ProductSale.objects.update(cost_amount=ExpressionWrapper(
+        F('quantity') * Subquery(purchase_price),
+        output_field=DecimalField(max_digits=12, decimal_places=2)
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_costlayer'),
+        ('sales', '0004_productsaleallocation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productsale',
+            name='cost_amount',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=12, verbose_name='Себестоимость'),
+        ),
+        migrations.CreateModel(
+            name='ProductSaleCost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.PositiveIntegerField(verbose_name='Количество')),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Себестоимость единицы')),
+                ('layer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='consumptions', to='inventory.costlayer', verbose_name='Слой себестоимости')),
+                ('product_sale', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='costs', to='sales.productsale', verbose_name='Товар в продаже')),
+            ],
+            options={
+                'verbose_name': 'Списание себестоимости',
+                'verbose_name_plural': 'Списания себестоимости',
+            },
+        ),
+        migrations.RunPython(backfill_cost_amount, migrations.RunPython.noop),
+    ]
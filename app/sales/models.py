@@ -1,6 +1,6 @@
 from django.db import models
-from authenticate.models import Company
-from inventory.models import Product
+from authenticate.models import Company, Storage
+from inventory.models import Product, CostLayer
 
 class Sale(models.Model):
     company = models.ForeignKey(
@@ -27,6 +27,9 @@ class Sale(models.Model):
         verbose_name = 'Продажа'
         verbose_name_plural = 'Продажи'
         ordering = ['-sale_date']
+        indexes = [
+            models.Index(fields=['company', 'sale_date'], name='sale_company_date_idx'),
+        ]
 
 class ProductSale(models.Model):
     sale = models.ForeignKey(
@@ -47,6 +50,12 @@ class ProductSale(models.Model):
         decimal_places=2,
         verbose_name='Цена продажи'
     )
+    cost_amount = models.DecimalField(
+        max_digits=12,
+        decimal_places=2,
+        default=0,
+        verbose_name='Себестоимость'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -56,4 +65,89 @@ class ProductSale(models.Model):
     class Meta:
         verbose_name = 'Товар в продаже'
         verbose_name_plural = 'Товары в продажах'
-        unique_together = ('sale', 'product')
\ No newline at end of file
+        unique_together = ('sale', 'product')
+        indexes = [
+            models.Index(fields=['product', 'sale'], name='productsale_product_sale_idx'),
+        ]
+
+class ProductSaleAllocation(models.Model):
+    product_sale = models.ForeignKey(
+        ProductSale,
+        on_delete=models.CASCADE,
+        related_name='allocations',
+        verbose_name='Товар в продаже'
+    )
+    storage = models.ForeignKey(
+        Storage,
+        on_delete=models.CASCADE,
+        related_name='sale_allocations',
+        verbose_name='Склад'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Списано со склада')
+
+    def __str__(self):
+        return f"{self.product_sale_id} - {self.storage_id} ({self.quantity} шт.)"
+
+    class Meta:
+        verbose_name = 'Списание товара продажи со склада'
+        verbose_name_plural = 'Списания товаров продаж со складов'
+
+class ProductSaleCost(models.Model):
+    product_sale = models.ForeignKey(
+        ProductSale,
+        on_delete=models.CASCADE,
+        related_name='costs',
+        verbose_name='Товар в продаже'
+    )
+    layer = models.ForeignKey(
+        CostLayer,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='consumptions',
+        verbose_name='Слой себестоимости'
+    )
+    quantity = models.PositiveIntegerField(verbose_name='Количество')
+    unit_cost = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        verbose_name='Себестоимость единицы'
+    )
+
+    def __str__(self):
+        return f"{self.product_sale_id} - {self.quantity} шт. по {self.unit_cost}"
+
+    class Meta:
+        verbose_name = 'Списание себестоимости'
+        verbose_name_plural = 'Списания себестоимости'
+
+class SalesDailyRollup(models.Model):
+    company = models.ForeignKey(
+        Company,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        verbose_name='Компания'
+    )
+    date = models.DateField(verbose_name='Дата')
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='sales_rollups',
+        verbose_name='Товар'
+    )
+    units = models.PositiveIntegerField(default=0, verbose_name='Продано единиц')
+    revenue = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Выручка'
+    )
+    sale_count = models.PositiveIntegerField(default=0, verbose_name='Количество продаж')
+
+    def __str__(self):
+        return f"{self.date} - {self.product_id}: {self.units} шт."
+
+    class Meta:
+        verbose_name = 'Дневной итог продаж'
+        verbose_name_plural = 'Дневные итоги продаж'
+        unique_together = ('company', 'date', 'product')
\ No newline at end of file
@@ -1,6 +1,5 @@
 from rest_framework import serializers
 from .models import Sale, ProductSale
-from inventory.models import Product
 from django.utils import timezone
 
 class ProductSaleSerializer(serializers.ModelSerializer):
@@ -25,13 +24,6 @@ class ProductSaleCreateSerializer(serializers.Serializer):
     product = serializers.IntegerField()
     quantity = serializers.IntegerField(min_value=1)
 
-    def validate_product(self, value):
-        try:
-            product = Product.objects.get(id=value)
-            return value
-        except Product.DoesNotExist:
-            raise serializers.ValidationError("Товар не найден")
-
 class SaleCreateSerializer(serializers.Serializer):
     buyer_name = serializers.CharField(max_length=255)
     sale_date = serializers.DateTimeField()
@@ -42,6 +34,28 @@ class SaleCreateSerializer(serializers.Serializer):
             raise serializers.ValidationError("Дата продажи не может быть в будущем")
         return value
 
+    def validate_product_sales(self, value):
+        product_ids = [item['product'] for item in value]
+        if len(product_ids) != len(set(product_ids)):
+            raise serializers.ValidationError("Товар не может повторяться в одной продаже")
+        return value
+
+class SaleFromReservationSerializer(serializers.Serializer):
+    buyer_name = serializers.CharField(max_length=255)
+    sale_date = serializers.DateTimeField()
+
+    def validate_sale_date(self, value):
+        if value > timezone.now():
+            raise serializers.ValidationError("Дата продажи не может быть в будущем")
+        return value
+
+class SaleBulkCreateSerializer(serializers.Serializer):
+    sales = serializers.ListField(
+        child=serializers.DictField(),
+        allow_empty=False,
+        max_length=5000
+    )
+
 class SaleUpdateSerializer(serializers.ModelSerializer):
     sale_date = serializers.DateTimeField(required=False)
 
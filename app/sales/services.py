@@ -0,0 +1,211 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from authenticate.models import Storage
+from inventory.costing import CostLayerConsumer, restore_layers
+from inventory.models import StockMovement, StorageProduct
+from inventory.services import decrease_stock, increase_stock
+
+from .models import Sale, ProductSale, ProductSaleAllocation, ProductSaleCost, SalesDailyRollup
+
+
+def rollup_rows(sale, product_sales, sale_date=None):
+    """Строки (дата, товар, количество, сумма) для дневных итогов по позициям продажи."""
+    day = timezone.localdate(sale_date or sale.sale_date)
+    return [
+        (day, product_sale.product_id, product_sale.quantity, product_sale.quantity * product_sale.sale_price)
+        for product_sale in product_sales
+    ]
+
+
+def update_rollups(company, rows, sign=1):
+    """
+    Применяет строки rollup_rows к SalesDailyRollup (sign=-1 — вычитает).
+
+    Число запросов не зависит от количества строк: недостающие записи
+    создаются одним bulk_create, существующие блокируются и обновляются
+    одним bulk_update, опустевшие удаляются одним delete.
+    """
+    deltas = defaultdict(lambda: [0, Decimal('0'), 0])
+    for day, product_id, quantity, amount in rows:
+        delta = deltas[(day, product_id)]
+        delta[0] += quantity
+        delta[1] += amount
+        delta[2] += 1
+
+    if not deltas:
+        return
+
+    if sign > 0:
+        SalesDailyRollup.objects.bulk_create(
+            [SalesDailyRollup(company=company, date=day, product_id=product_id) for day, product_id in deltas],
+            ignore_conflicts=True
+        )
+
+    rollups = SalesDailyRollup.objects.select_for_update().filter(
+        company=company,
+        date__in={day for day, _ in deltas},
+        product_id__in={product_id for _, product_id in deltas}
+    )
+
+    changed = []
+    emptied = []
+    for rollup in rollups:
+        delta = deltas.get((rollup.date, rollup.product_id))
+        if delta is None:
+            continue
+        rollup.units += sign * delta[0]
+        rollup.revenue += sign * delta[1]
+        rollup.sale_count += sign * delta[2]
+        if rollup.sale_count <= 0:
+            emptied.append(rollup.pk)
+        else:
+            changed.append(rollup)
+
+    if changed:
+        SalesDailyRollup.objects.bulk_update(changed, ['units', 'revenue', 'sale_count'])
+    if emptied:
+        SalesDailyRollup.objects.filter(pk__in=emptied).delete()
+
+
+def create_sales(company, entries):
+    """
+    Пакетно создает продажи и их позиции, фиксирует себестоимость по слоям
+    FIFO, склады списания и движения в журнале, обновляет дневные итоги.
+
+    entries — список пар (validated_data, lines), где lines — результат
+    StockAllocator.allocate для этой продажи. Возвращает созданные Sale
+    в том же порядке.
+    """
+    sales = Sale.objects.bulk_create([
+        Sale(
+            company=company,
+            buyer_name=data['buyer_name'],
+            sale_date=data['sale_date'],
+            total_amount=sum(product.sale_price * quantity for product, quantity, _ in lines)
+        )
+        for data, lines in entries
+    ])
+
+    positions = [
+        (sale, product, quantity, deductions)
+        for sale, (data, lines) in zip(sales, entries)
+        for product, quantity, deductions in lines
+    ]
+
+    consumer = CostLayerConsumer(company, [product.id for _, product, _, _ in positions])
+    costs = [consumer.consume(product, quantity) for _, product, quantity, _ in positions]
+    consumer.save()
+
+    product_sales = ProductSale.objects.bulk_create([
+        ProductSale(
+            sale=sale,
+            product=product,
+            quantity=quantity,
+            sale_price=product.sale_price,
+            cost_amount=cost
+        )
+        for (sale, product, quantity, _), (cost, _) in zip(positions, costs)
+    ])
+
+    ProductSaleCost.objects.bulk_create([
+        ProductSaleCost(
+            product_sale=product_sale,
+            layer=layer,
+            quantity=taken,
+            unit_cost=unit_cost
+        )
+        for product_sale, (_, parts) in zip(product_sales, costs)
+        for layer, taken, unit_cost in parts
+    ])
+
+    allocations = ProductSaleAllocation.objects.bulk_create([
+        ProductSaleAllocation(
+            product_sale=product_sale,
+            storage_id=storage_product.storage_id,
+            quantity=deduct_quantity
+        )
+        for product_sale, (_, _, _, deductions) in zip(product_sales, positions)
+        for storage_product, deduct_quantity in deductions
+    ])
+
+    movements = [
+        StockMovement(
+            storage_id=allocation.storage_id,
+            product_id=allocation.product_sale.product_id,
+            delta=-allocation.quantity,
+            reason=StockMovement.REASON_SALE,
+            reference=f'sale:{allocation.product_sale.sale_id}'
+        )
+        for allocation in allocations
+    ]
+    StockMovement.objects.bulk_create(movements)
+
+    update_rollups(company, [
+        row
+        for product_sale in product_sales
+        for row in rollup_rows(product_sale.sale, [product_sale])
+    ])
+
+    return sales
+
+
+def sell_reservation(company, data, reservations):
+    """
+    Оформляет продажу по строкам брони (inventory.reservations.take_reservation).
+
+    Наличие заново не проверяется: забронированные единицы уже исключены
+    из доступного количества, поэтому склады и количества берутся из брони
+    и списываются одним условным UPDATE. Возвращает созданную Sale.
+    """
+    positions = {}
+    deductions = defaultdict(int)
+    for reservation in reservations:
+        product, quantity, storages = positions.get(reservation.product_id, (reservation.product, 0, []))
+        # Несохраненная строка склада в формате StockAllocator.allocate: брони
+        # известны склад и товар, но не остаток, поэтому quantity остается нулевым
+        storage_product = StorageProduct(storage_id=reservation.storage_id, product_id=reservation.product_id)
+        storages.append((storage_product, reservation.quantity))
+        positions[reservation.product_id] = (product, quantity + reservation.quantity, storages)
+        deductions[(reservation.storage_id, reservation.product_id)] += reservation.quantity
+
+    decrease_stock(deductions)
+    return create_sales(company, [(data, list(positions.values()))])[0]
+
+
+def restock_sale(sale):
+    """
+    Возвращает товары продажи на те склады, с которых они были списаны.
+
+    Позиции без записей ProductSaleAllocation (созданные до их появления)
+    возвращаются на первый склад компании, как раньше. Число запросов
+    не зависит от количества позиций.
+    """
+    returns = {}
+    allocated = ProductSaleAllocation.objects.filter(product_sale__sale=sale).values(
+        'storage_id', 'product_sale__product_id'
+    ).annotate(total=Sum('quantity')).order_by()
+    for row in allocated:
+        returns[(row['storage_id'], row['product_sale__product_id'])] = row['total']
+
+    legacy_lines = list(sale.product_sales.filter(allocations__isnull=True).values_list('product_id', 'quantity'))
+    if legacy_lines:
+        main_storage = Storage.objects.filter(company=sale.company).order_by('id').first()
+        if main_storage:
+            for product_id, quantity in legacy_lines:
+                key = (main_storage.id, product_id)
+                returns[key] = returns.get(key, 0) + quantity
+
+    increase_stock(returns, StockMovement.REASON_SALE_DELETE, f'sale:{sale.pk}')
+
+
+def restore_sale_costs(sale):
+    """Возвращает в слои себестоимости единицы, списанные продажей."""
+    consumed = ProductSaleCost.objects.filter(
+        product_sale__sale=sale,
+        layer__isnull=False
+    ).values('layer_id').annotate(total=Sum('quantity')).order_by()
+    restore_layers({row['layer_id']: row['total'] for row in consumed})
@@ -1 +1,373 @@
-from django.test import TestCase
\ No newline at end of file
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+from rest_framework import status
+from authenticate.models import User, Company, Storage
+from decimal import Decimal
+from inventory.models import Product, StorageProduct, CostLayer, StockMovement, StockReservation
+from inventory.services import StockAllocator, sync_on_hand, sync_used_units
+from sales.models import Sale, ProductSale, SalesDailyRollup
+
+class SaleTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='test@example.com', password='testpass123')
+        self.company = Company.objects.create(owner=self.user, name='Test Company', inn='1234567890')
+        self.storage = Storage.objects.create(
+            company=self.company,
+            name='Main Storage',
+            address='Test Address',
+            capacity=1000
+        )
+        self.reserve_storage = Storage.objects.create(
+            company=self.company,
+            name='Reserve Storage',
+            address='Test Address',
+            capacity=1000
+        )
+        self.product = Product.objects.create(
+            company=self.company,
+            name='Test Product',
+            purchase_price='100.00',
+            sale_price='150.00'
+        )
+        StorageProduct.objects.create(storage=self.storage, product=self.product, quantity=5)
+        StorageProduct.objects.create(storage=self.reserve_storage, product=self.product, quantity=10)
+        sync_on_hand()
+        sync_used_units()
+        self.client.force_authenticate(user=self.user)
+
+    def sale_payload(self, quantity):
+        return {
+            'buyer_name': 'Test Buyer',
+            'sale_date': '2025-09-26T10:30:00Z',
+            'product_sales': [{'product': self.product.id, 'quantity': quantity}]
+        }
+
+    def test_create_sale_deducts_stock_fifo(self):
+        response = self.client.post(reverse('sales'), self.sale_payload(8), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_amount'], '1200.00')
+        self.assertEqual(
+            list(StorageProduct.objects.order_by('id').values_list('quantity', flat=True)),
+            [0, 7]
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, 7)
+        self.assertEqual(
+            list(Storage.objects.order_by('id').values_list('used_units', flat=True)),
+            [0, 7]
+        )
+
+    def test_create_sale_insufficient_stock(self):
+        response = self.client.post(reverse('sales'), self.sale_payload(16), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Sale.objects.count(), 0)
+        self.assertEqual(sum(StorageProduct.objects.values_list('quantity', flat=True)), 15)
+
+    def test_allocation_query_count_is_flat(self):
+        products = [
+            Product.objects.create(
+                company=self.company,
+                name=f'Product {i}',
+                purchase_price='10.00',
+                sale_price='20.00'
+            )
+            for i in range(20)
+        ]
+        StorageProduct.objects.bulk_create(
+            StorageProduct(storage=storage, product=product, quantity=3)
+            for product in products
+            for storage in (self.storage, self.reserve_storage)
+        )
+        sync_on_hand()
+        sync_used_units()
+
+        def count_queries(items):
+            with CaptureQueriesContext(connection) as context:
+                allocator = StockAllocator(self.company, [item['product'] for item in items])
+                allocator.allocate(items)
+                allocator.save()
+            return len(context.captured_queries)
+
+        small = [{'product': product.id, 'quantity': 4} for product in products[:2]]
+        large = [{'product': product.id, 'quantity': 4} for product in products[2:]]
+        self.assertEqual(count_queries(small), count_queries(large))
+
+    def test_bulk_create_sales_reports_per_sale_results(self):
+        payload = {
+            'sales': [
+                self.sale_payload(6),
+                self.sale_payload(100),
+                {'buyer_name': 'Test Buyer', 'product_sales': []},
+                self.sale_payload(9),
+            ]
+        }
+        response = self.client.post(reverse('sales-bulk'), payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['created', 'error', 'error', 'created']
+        )
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertEqual(sum(StorageProduct.objects.values_list('quantity', flat=True)), 0)
+
+    def test_list_sales_with_cursor(self):
+        for day in range(1, 6):
+            Sale.objects.create(
+                company=self.company,
+                buyer_name=f'Buyer {day}',
+                sale_date=f'2025-09-0{day}T10:00:00Z'
+            )
+
+        seen = []
+        params = {'cursor': '', 'page_size': 2}
+        while True:
+            response = self.client.get(reverse('sales'), params)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.data)
+            seen.extend(sale['buyer_name'] for sale in response.data['results'])
+            if not response.data['next']:
+                break
+            params['cursor'] = response.data['next']
+
+        self.assertEqual(seen, [f'Buyer {day}' for day in range(5, 0, -1)])
+
+        for page_size in (0, -3):
+            response = self.client.get(reverse('sales'), {'cursor': '', 'page_size': page_size})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), 1)
+
+    def test_list_sales_date_range_is_inclusive(self):
+        for sale_date in ('2025-09-01T23:59:59Z', '2025-09-02T00:00:00Z', '2025-09-03T00:00:00Z'):
+            Sale.objects.create(company=self.company, buyer_name='Buyer', sale_date=sale_date)
+
+        response = self.client.get(reverse('sales'), {'start_date': '2025-09-01', 'end_date': '2025-09-02'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 2)
+
+    def test_list_sales_query_count_is_constant(self):
+        products = [
+            Product.objects.create(
+                company=self.company,
+                name=f'Product {i}',
+                purchase_price='10.00',
+                sale_price='20.00'
+            )
+            for i in range(3)
+        ]
+        for day in range(1, 9):
+            sale = Sale.objects.create(
+                company=self.company,
+                buyer_name=f'Buyer {day}',
+                sale_date=f'2025-09-0{day}T10:00:00Z'
+            )
+            ProductSale.objects.bulk_create(
+                ProductSale(sale=sale, product=product, quantity=1, sale_price='20.00')
+                for product in products
+            )
+
+        def count_queries(page_size):
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.get(reverse('sales'), {'page_size': page_size})
+            self.assertEqual(len(response.data['results']), page_size)
+            return len(context.captured_queries)
+
+        self.client.get(reverse('sales'))
+        self.assertEqual(count_queries(2), count_queries(8))
+
+    def test_rollup_follows_sale_lifecycle(self):
+        response = self.client.post(reverse('sales'), self.sale_payload(4), format='json')
+        sale_id = response.data['id']
+
+        stats = self.client.get(reverse('sales-stats'), {'group_by': 'product'}).data
+        self.assertEqual(stats['total_units'], 4)
+        self.assertEqual(stats['results'][0]['sale_count'], 1)
+
+        self.client.put(
+            reverse('sale-detail', args=[sale_id]),
+            {'sale_date': '2025-09-20T10:00:00Z'},
+            format='json'
+        )
+        stats = self.client.get(reverse('sales-stats')).data
+        self.assertEqual(
+            [(str(row['date']), row['line_count']) for row in stats['results']],
+            [('2025-09-20', 1)]
+        )
+
+        rollups = list(SalesDailyRollup.objects.values_list('date', 'product_id', 'units', 'revenue', 'sale_count'))
+        call_command('rebuild_sales_rollup', stdout=StringIO())
+        self.assertEqual(
+            list(SalesDailyRollup.objects.values_list('date', 'product_id', 'units', 'revenue', 'sale_count')),
+            rollups
+        )
+
+        self.client.delete(reverse('sale-detail', args=[sale_id]))
+        self.assertFalse(SalesDailyRollup.objects.exists())
+
+        other = Product.objects.create(
+            company=self.company, name='Other Product', purchase_price='10.00', sale_price='20.00'
+        )
+        StorageProduct.objects.create(storage=self.storage, product=other, quantity=3)
+        sync_on_hand()
+        sync_used_units()
+        payload = self.sale_payload(1)
+        payload['product_sales'].append({'product': other.id, 'quantity': 1})
+        self.client.post(reverse('sales'), payload, format='json')
+
+        day = self.client.get(reverse('sales-stats')).data['results']
+        self.assertEqual([(row['units'], row['line_count']) for row in day], [(2, 2)])
+        by_product = self.client.get(reverse('sales-stats'), {'group_by': 'product'}).data['results']
+        self.assertEqual(sorted(row['sale_count'] for row in by_product), [1, 1])
+
+        for value in ('2025-13-45', 'вчера'):
+            response = self.client.get(reverse('sales-stats'), {'start_date': value})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_sales_streams_csv_and_ndjson(self):
+        self.client.post(reverse('sales'), self.sale_payload(2), format='json')
+
+        response = self.client.get(reverse('sales-export'), {'format': 'csv'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        rows = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(rows[0], 'sale_id,sale_date,buyer_name,product_id,product_name,quantity,sale_price')
+        self.assertEqual(len(rows), 2)
+
+        response = self.client.get(reverse('sales-export'), {'format': 'ndjson', 'start_date': '2025-09-27'})
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_idempotent_sale_replay_does_not_deduct_twice(self):
+        url = reverse('sales')
+        first = self.client.post(url, self.sale_payload(3), format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        second = self.client.post(url, self.sale_payload(3), format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data['id'], first.data['id'])
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(sum(StorageProduct.objects.values_list('quantity', flat=True)), 12)
+
+        third = self.client.post(url, self.sale_payload(4), format='json', HTTP_IDEMPOTENCY_KEY='retry-1')
+        self.assertEqual(third.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_delete_sale_restocks_original_storages(self):
+        response = self.client.post(reverse('sales'), self.sale_payload(8), format='json')
+        StorageProduct.objects.filter(storage=self.storage).delete()
+
+        response = self.client.delete(reverse('sale-detail', args=[response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(
+            dict(StorageProduct.objects.values_list('storage_id', 'quantity')),
+            {self.storage.id: 5, self.reserve_storage.id: 10}
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, 15)
+        self.assertEqual(
+            sorted(StockMovement.objects.values_list('reason', 'storage_id', 'delta')),
+            [
+                ('sale', self.storage.id, -5), ('sale', self.reserve_storage.id, -3),
+                ('sale_delete', self.storage.id, 5), ('sale_delete', self.reserve_storage.id, 3),
+            ]
+        )
+
+    def test_sale_consumes_cost_layers_fifo(self):
+        old_layer = CostLayer.objects.create(
+            company=self.company, product=self.product, received_at='2025-01-01T00:00:00Z',
+            unit_cost='90.00', quantity=3, remaining=3
+        )
+        new_layer = CostLayer.objects.create(
+            company=self.company, product=self.product, received_at='2025-02-01T00:00:00Z',
+            unit_cost='120.00', quantity=12, remaining=12
+        )
+
+        response = self.client.post(reverse('sales'), self.sale_payload(5), format='json')
+        margins = self.client.get(reverse('sales-margins')).data['results']
+        self.assertEqual(margins[0]['cost'], Decimal('510.00'))
+        self.assertEqual(margins[0]['profit'], Decimal('240.00'))
+
+        self.client.delete(reverse('sale-detail', args=[response.data['id']]))
+        old_layer.refresh_from_db()
+        new_layer.refresh_from_db()
+        self.assertEqual((old_layer.remaining, new_layer.remaining), (3, 12))
+
+    def test_sale_consumes_more_layers_than_one_update_allows(self):
+        Storage.objects.filter(pk=self.reserve_storage.pk).update(capacity=2000)
+        StorageProduct.objects.filter(storage=self.reserve_storage).update(quantity=1195)
+        sync_on_hand()
+        sync_used_units()
+        CostLayer.objects.bulk_create([
+            CostLayer(
+                company=self.company, product=self.product, received_at='2025-01-01T00:00:00Z',
+                unit_cost='10.00', quantity=1, remaining=1
+            )
+            for _ in range(1200)
+        ])
+
+        response = self.client.post(reverse('sales'), self.sale_payload(1200), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(CostLayer.objects.filter(remaining__gt=0).exists())
+
+        self.client.delete(reverse('sale-detail', args=[response.data['id']]))
+        self.assertEqual(CostLayer.objects.filter(remaining=1).count(), 1200)
+
+    def test_sale_crossing_reorder_point_raises_alert(self):
+        storage_product = StorageProduct.objects.get(storage=self.storage)
+        response = self.client.put(
+            reverse('storage-product-detail', args=[storage_product.id]),
+            {'reorder_point': 2, 'quantity': 100},
+            format='json'
+        )
+        self.assertEqual((response.data['reorder_point'], response.data['quantity']), (2, 5))
+        StorageProduct.objects.filter(storage=self.reserve_storage).update(reorder_point=5)
+
+        response = self.client.post(reverse('sales'), self.sale_payload(8), format='json')
+        feed = self.client.get(reverse('stock-alerts')).data
+        self.assertEqual(
+            [(alert['kind'], alert['storage'], alert['quantity']) for alert in feed['results']],
+            [('low', self.storage.id, 0)]
+        )
+
+        self.client.delete(reverse('sale-detail', args=[response.data['id']]))
+        feed = self.client.get(reverse('stock-alerts'), {'since': feed['since']}).data
+        self.assertEqual([alert['kind'] for alert in feed['results']], ['restored'])
+
+    def test_reservation_holds_stock_and_converts_to_sale(self):
+        response = self.client.post(reverse('stock-reservations'), {
+            'products': [{'product': self.product.id, 'quantity': 7}]
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [(line['storage'], line['quantity']) for line in response.data['lines']],
+            [(self.storage.id, 5), (self.reserve_storage.id, 2)]
+        )
+        key = response.data['key']
+
+        # Свободно 15 - 7 = 8 единиц, и только на резервном складе
+        response = self.client.post(reverse('sales'), self.sale_payload(9), format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(reverse('sales'), self.sale_payload(8), format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            list(StorageProduct.objects.order_by('id').values_list('quantity', flat=True)),
+            [5, 2]
+        )
+
+        url = reverse('sale-from-reservation', args=[key])
+        payload = {'buyer_name': 'Checkout', 'sale_date': '2025-09-26T10:30:00Z'}
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['total_amount'], '1050.00')
+        self.assertEqual(
+            list(StorageProduct.objects.order_by('id').values_list('quantity', flat=True)),
+            [0, 0]
+        )
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.on_hand, 0)
+        self.assertFalse(StockReservation.objects.exists())
+
+        response = self.client.post(url, payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
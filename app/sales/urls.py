@@ -1,7 +1,15 @@
 from django.urls import path
-from .views import SalesView, SaleDetailView
+from .views import (
+    SalesView, SaleBulkView, SaleStatsView, SaleMarginView, SaleExportView, SaleDetailView,
+    SaleFromReservationView
+)
 
 urlpatterns = [
     path('', SalesView.as_view(), name='sales'),
+    path('bulk/', SaleBulkView.as_view(), name='sales-bulk'),
+    path('stats/', SaleStatsView.as_view(), name='sales-stats'),
+    path('margins/', SaleMarginView.as_view(), name='sales-margins'),
+    path('export/', SaleExportView.as_view(), name='sales-export'),
+    path('reservations/<uuid:key>/', SaleFromReservationView.as_view(), name='sale-from-reservation'),
     path('<int:pk>/', SaleDetailView.as_view(), name='sale-detail'),
 ]
\ No newline at end of file
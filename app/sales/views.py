@@ -1,22 +1,42 @@
+import csv
+import json
+from itertools import chain
+
 from rest_framework import status, permissions
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from django.db import transaction
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
 from django.utils import timezone
 from django.core.paginator import Paginator
-from django.db.models import Sum
+from django.db.models import DecimalField, ExpressionWrapper, F, Prefetch, Sum
+from django.db.models.functions import TruncDay, TruncMonth
+from django.utils.dateparse import parse_date
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiExample
 
-from .models import Sale, ProductSale
+from .models import Sale, ProductSale, SalesDailyRollup
+from .services import create_sales, update_rollups, rollup_rows, restock_sale, restore_sale_costs, sell_reservation
 from .serializers import (
     SaleSerializer,
     SaleCreateSerializer,
+    SaleFromReservationSerializer,
+    SaleBulkCreateSerializer,
     SaleUpdateSerializer,
     ProductSaleSerializer
 )
-from inventory.models import Product, StorageProduct
-from authenticate.models import Storage
+from inventory.reservations import ReservationError, take_reservation
+from inventory.services import StockAllocator, AllocationError, StockConflictError
 from authenticate.permissions import IsCompanyMember
+from companies.idempotency import idempotent
+from core.dates import date_range_bounds
+from core.pagination import paginate_by_cursor
+
+
+def sales_with_lines():
+    return Sale.objects.select_related('company').prefetch_related(
+        Prefetch('product_sales', queryset=ProductSale.objects.select_related('product'))
+    )
 
 
 class SalesView(APIView):
@@ -43,9 +63,18 @@ class SalesView(APIView):
                     ]
                 }
             )
+        ],
+        parameters=[
+            OpenApiParameter(
+                name='Idempotency-Key',
+                location=OpenApiParameter.HEADER,
+                description='Ключ для безопасного повтора запроса',
+                type=str
+            ),
         ]
     )
     @transaction.atomic
+    @idempotent
     def post(self, request):
         if not hasattr(request.user, 'owned_company'):
             return Response(
@@ -59,76 +88,25 @@ class SalesView(APIView):
                 return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
             data = serializer.validated_data
+            company = request.user.owned_company
 
-            sale = Sale.objects.create(
-                company=request.user.owned_company,
-                buyer_name=data['buyer_name'],
-                sale_date=data['sale_date']
-            )
+            allocator = StockAllocator(company, [item['product'] for item in data['product_sales']])
+            try:
+                lines = allocator.allocate(data['product_sales'])
+                allocator.save()
+                sale = create_sales(company, [(data, lines)])[0]
+            except StockConflictError as e:
+                transaction.set_rollback(True)
+                return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+            except AllocationError as e:
+                return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-            total_amount = 0
-            product_sales = []
-
-            for item in data['product_sales']:
-                try:
-                    product = Product.objects.get(id=item['product'])
-
-                    if product.company != request.user.owned_company:
-                        sale.delete()
-                        return Response(
-                            {'detail': f'Товар с ID {item["product"]} не принадлежит вашей компании'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                    storage_products = StorageProduct.objects.filter(
-                        product=product,
-                        storage__company=request.user.owned_company
-                    )
-                    total_available = storage_products.aggregate(total=Sum('quantity'))['total'] or 0
-
-                    if total_available < item['quantity']:
-                        sale.delete()
-                        return Response(
-                            {
-                                'detail': f'Недостаточно товара "{product.name}". Доступно: {total_available}, запрошено: {item["quantity"]}'},
-                            status=status.HTTP_400_BAD_REQUEST
-                        )
-
-                    remaining_quantity = item['quantity']
-                    for storage_product in storage_products.order_by('id'):
-                        if remaining_quantity <= 0:
-                            break
-
-                        deduct_quantity = min(remaining_quantity, storage_product.quantity)
-                        storage_product.quantity -= deduct_quantity
-                        storage_product.save()
-                        remaining_quantity -= deduct_quantity
-
-                    product_sale = ProductSale(
-                        sale=sale,
-                        product=product,
-                        quantity=item['quantity'],
-                        sale_price=product.sale_price
-                    )
-                    product_sales.append(product_sale)
-
-                    total_amount += product.sale_price * item['quantity']
-
-                except Product.DoesNotExist:
-                    sale.delete()
-                    return Response(
-                        {'detail': f'Товар с ID {item["product"]} не найден'},
-                        status=status.HTTP_400_BAD_REQUEST
-                    )
-
-            ProductSale.objects.bulk_create(product_sales)
-
-            sale.total_amount = total_amount
-            sale.save()
+            sale = sales_with_lines().get(pk=sale.pk)
 
             return Response(SaleSerializer(sale).data, status=status.HTTP_201_CREATED)
 
         except Exception as e:
+            transaction.set_rollback(True)
             return Response(
                 {'detail': f'Ошибка при создании продажи: {str(e)}'},
                 status=status.HTTP_400_BAD_REQUEST
@@ -136,6 +114,12 @@ class SalesView(APIView):
 
     @extend_schema(
         parameters=[
+            OpenApiParameter(
+                name='cursor',
+                description='Курсор keyset-пагинации (пустое значение — первая страница). '
+                            'Ответ без count/total_pages, со ссылкой next',
+                type=str
+            ),
             OpenApiParameter(name='page', description='Номер страницы', type=int),
             OpenApiParameter(name='page_size', description='Размер страницы', type=int),
             OpenApiParameter(name='start_date', description='Начальная дата (YYYY-MM-DD)', type=str),
@@ -151,20 +135,35 @@ class SalesView(APIView):
             )
 
         try:
-            sales = Sale.objects.filter(company=request.user.owned_company).order_by('-sale_date')
+            sales = sales_with_lines().filter(company=request.user.owned_company).order_by('-sale_date')
 
             start_date = request.GET.get('start_date')
             end_date = request.GET.get('end_date')
 
-            if start_date:
-                sales = sales.filter(sale_date__date__gte=start_date)
+            start, end = date_range_bounds(start_date, end_date)
+
+            if start:
+                sales = sales.filter(sale_date__gte=start)
+
+            if end:
+                sales = sales.filter(sale_date__lt=end)
 
-            if end_date:
-                sales = sales.filter(sale_date__date__lte=end_date)
+            page_size = min(max(int(request.GET.get('page_size', 20)), 1), 100)
+
+            if 'cursor' in request.GET:
+                results, next_cursor = paginate_by_cursor(
+                    sales,
+                    ('-sale_date', '-id'),
+                    cursor=request.GET.get('cursor'),
+                    page_size=page_size
+                )
+                return Response({
+                    'next': next_cursor,
+                    'results': SaleSerializer(results, many=True).data
+                })
 
             # Пагинация
             page = int(request.GET.get('page', 1))
-            page_size = int(request.GET.get('page_size', 20))
 
             paginator = Paginator(sales, page_size)
             page_obj = paginator.get_page(page)
@@ -185,12 +184,142 @@ class SalesView(APIView):
             )
 
 
+class SaleBulkView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(
+        request=SaleBulkCreateSerializer,
+        examples=[
+            OpenApiExample(
+                'Example',
+                value={
+                    "sales": [
+                        {
+                            "buyer_name": "Миомант Миомов",
+                            "sale_date": "2025-09-26T10:30:00Z",
+                            "product_sales": [{"product": 10, "quantity": 2}]
+                        },
+                        {
+                            "buyer_name": "Иван Иванов",
+                            "sale_date": "2025-09-26T10:31:00Z",
+                            "product_sales": [{"product": 1, "quantity": 1}]
+                        }
+                    ]
+                }
+            )
+        ]
+    )
+    @transaction.atomic
+    def post(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = SaleBulkCreateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        company = request.user.owned_company
+        results = []
+        valid = []
+
+        for index, raw_sale in enumerate(serializer.validated_data['sales']):
+            sale_serializer = SaleCreateSerializer(data=raw_sale)
+            if sale_serializer.is_valid():
+                valid.append((index, sale_serializer.validated_data))
+                results.append(None)
+            else:
+                results.append({'index': index, 'status': 'error', 'errors': sale_serializer.errors})
+
+        # Остатки по всем товарам пакета загружаются и резервируются за один проход
+        allocator = StockAllocator(
+            company,
+            [item['product'] for _, data in valid for item in data['product_sales']]
+        )
+
+        entries = []
+        indexes = []
+        for index, data in valid:
+            try:
+                lines = allocator.allocate(data['product_sales'])
+            except AllocationError as e:
+                results[index] = {'index': index, 'status': 'error', 'errors': {'detail': str(e)}}
+                continue
+            entries.append((data, lines))
+            indexes.append(index)
+
+        try:
+            allocator.save()
+            sales = create_sales(company, entries)
+        except StockConflictError as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        for index, sale in zip(indexes, sales):
+            results[index] = {
+                'index': index,
+                'status': 'created',
+                'id': sale.id,
+                'total_amount': str(sale.total_amount)
+            }
+
+        return Response({
+            'created': len(sales),
+            'failed': len(results) - len(sales),
+            'results': results
+        })
+
+
+class SaleFromReservationView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(
+        request=SaleFromReservationSerializer,
+        responses={201: SaleSerializer},
+        parameters=[
+            OpenApiParameter(
+                name='Idempotency-Key',
+                location=OpenApiParameter.HEADER,
+                description='Ключ для безопасного повтора запроса',
+                type=str
+            ),
+        ]
+    )
+    @transaction.atomic
+    @idempotent
+    def post(self, request, key):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        serializer = SaleFromReservationSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        company = request.user.owned_company
+        try:
+            reservations = take_reservation(company, key)
+            sale = sell_reservation(company, serializer.validated_data, reservations)
+        except ReservationError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_404_NOT_FOUND)
+        except StockConflictError as e:
+            transaction.set_rollback(True)
+            return Response({'detail': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        sale = sales_with_lines().get(pk=sale.pk)
+        return Response(SaleSerializer(sale).data, status=status.HTTP_201_CREATED)
+
+
 class SaleDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
 
     def get_object(self, pk, user):
         try:
-            sale = Sale.objects.get(pk=pk)
+            sale = sales_with_lines().get(pk=pk)
             if hasattr(user, 'owned_company') and sale.company == user.owned_company:
                 return sale
             return None
@@ -212,6 +341,7 @@ class SaleDetailView(APIView):
         request=SaleUpdateSerializer,
         responses={200: SaleSerializer}
     )
+    @transaction.atomic
     def put(self, request, pk):
         sale = self.get_object(pk, request.user)
         if not sale:
@@ -222,7 +352,15 @@ class SaleDetailView(APIView):
 
         serializer = SaleUpdateSerializer(sale, data=request.data, partial=True)
         if serializer.is_valid():
+            old_sale_date = sale.sale_date
             serializer.save()
+
+            # Перенос продажи на другой день переносит ее и в дневных итогах
+            if timezone.localdate(old_sale_date) != timezone.localdate(sale.sale_date):
+                product_sales = sale.product_sales.all()
+                update_rollups(sale.company, rollup_rows(sale, product_sales, sale_date=old_sale_date), sign=-1)
+                update_rollups(sale.company, rollup_rows(sale, product_sales))
+
             return Response(SaleSerializer(sale).data)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -235,22 +373,219 @@ class SaleDetailView(APIView):
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        for product_sale in sale.product_sales.all():
-            product = product_sale.product
-
-            main_storage = Storage.objects.filter(company=request.user.owned_company).first()
-            if main_storage:
-                storage_product, created = StorageProduct.objects.get_or_create(
-                    storage=main_storage,
-                    product=product,
-                    defaults={'quantity': 0}
-                )
-                storage_product.quantity += product_sale.quantity
-                storage_product.save()
-
+        restock_sale(sale)
+        restore_sale_costs(sale)
+        update_rollups(sale.company, rollup_rows(sale, sale.product_sales.all()), sign=-1)
         sale.delete()
 
         return Response(
             {'detail': 'Продажа удалена, товары возвращены на склад'},
             status=status.HTTP_204_NO_CONTENT
-        )
\ No newline at end of file
+        )
+
+
+class SaleStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name='group_by',
+                description='Группировка: day или product. По товарам sale_count — число продаж товара; '
+                            'по дням line_count — число позиций продаж (продажа с двумя товарами дает 2)',
+                type=str
+            ),
+            OpenApiParameter(name='start_date', description='Начальная дата (YYYY-MM-DD)', type=str),
+            OpenApiParameter(name='end_date', description='Конечная дата (YYYY-MM-DD)', type=str),
+        ]
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        group_by = request.GET.get('group_by', 'day')
+        if group_by not in ('day', 'product'):
+            return Response(
+                {'detail': 'group_by должен быть day или product'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        # Статистика читается только из дневных итогов, без сканирования продаж
+        rollups = SalesDailyRollup.objects.filter(company=request.user.owned_company)
+
+        for param, lookup in (('start_date', 'date__gte'), ('end_date', 'date__lte')):
+            value = request.GET.get(param)
+            if not value:
+                continue
+            try:
+                # parse_date возвращает None для строки не по формату и бросает ValueError для невозможной даты
+                day = parse_date(value)
+            except ValueError:
+                day = None
+            if day is None:
+                return Response(
+                    {'detail': f'Некорректная дата: {value}'},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            rollups = rollups.filter(**{lookup: day})
+
+        if group_by == 'day':
+            # Итоги ведутся по (дата, товар): сумма sale_count за день — число позиций,
+            # а не различных продаж, поэтому поле называется line_count
+            results = rollups.values('date').annotate(
+                units=Sum('units'),
+                revenue=Sum('revenue'),
+                line_count=Sum('sale_count')
+            ).order_by('date')
+        else:
+            results = rollups.values('product_id', 'product__name').annotate(
+                units=Sum('units'),
+                revenue=Sum('revenue'),
+                sale_count=Sum('sale_count')
+            ).order_by('-revenue')
+
+        totals = rollups.aggregate(units=Sum('units'), revenue=Sum('revenue'))
+
+        return Response({
+            'group_by': group_by,
+            'total_units': totals['units'] or 0,
+            'total_revenue': totals['revenue'] or 0,
+            'results': list(results)
+        })
+
+
+class SaleMarginView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    periods = {'day': TruncDay, 'month': TruncMonth}
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='group_by', description='Группировка: product, day или month', type=str),
+            OpenApiParameter(name='start_date', description='Начальная дата (YYYY-MM-DD)', type=str),
+            OpenApiParameter(name='end_date', description='Конечная дата (YYYY-MM-DD)', type=str),
+        ]
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        group_by = request.GET.get('group_by', 'product')
+        if group_by != 'product' and group_by not in self.periods:
+            return Response(
+                {'detail': 'group_by должен быть product, day или month'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start, end = date_range_bounds(request.GET.get('start_date'), request.GET.get('end_date'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Себестоимость зафиксирована в позициях при продаже, пересчет слоев не нужен
+        lines = ProductSale.objects.filter(sale__company=request.user.owned_company)
+        if start:
+            lines = lines.filter(sale__sale_date__gte=start)
+        if end:
+            lines = lines.filter(sale__sale_date__lt=end)
+
+        if group_by == 'product':
+            lines = lines.values('product_id', 'product__name')
+            ordering = 'product_id'
+        else:
+            lines = lines.annotate(period=self.periods[group_by]('sale__sale_date')).values('period')
+            ordering = 'period'
+
+        results = lines.annotate(
+            units=Sum('quantity'),
+            revenue=Sum(ExpressionWrapper(
+                F('quantity') * F('sale_price'),
+                output_field=DecimalField(max_digits=14, decimal_places=2)
+            )),
+            cost=Sum('cost_amount')
+        ).order_by(ordering)
+
+        rows = []
+        for row in results:
+            row['profit'] = row['revenue'] - row['cost']
+            row['margin'] = round(row['profit'] / row['revenue'] * 100, 2) if row['revenue'] else None
+            rows.append(row)
+
+        return Response({'group_by': group_by, 'results': rows})
+
+
+class _Echo:
+    """Псевдо-файл для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class SaleExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated, IsCompanyMember]
+
+    fields = ('sale_id', 'sale_date', 'buyer_name', 'product_id', 'product_name', 'quantity', 'sale_price')
+    chunk_size = 2000
+
+    def perform_content_negotiation(self, request, force=False):
+        # ?format= выбирает формат выгрузки, а не рендерер DRF
+        return super().perform_content_negotiation(request, force=True)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(name='format', description='Формат выгрузки: csv или ndjson', type=str),
+            OpenApiParameter(name='start_date', description='Начальная дата (YYYY-MM-DD)', type=str),
+            OpenApiParameter(name='end_date', description='Конечная дата (YYYY-MM-DD)', type=str),
+        ]
+    )
+    def get(self, request):
+        if not hasattr(request.user, 'owned_company'):
+            return Response(
+                {'detail': 'Компания не найдена'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in ('csv', 'ndjson'):
+            return Response(
+                {'detail': 'format должен быть csv или ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start, end = date_range_bounds(request.GET.get('start_date'), request.GET.get('end_date'))
+        except ValueError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = ProductSale.objects.filter(sale__company=request.user.owned_company)
+        if start:
+            lines = lines.filter(sale__sale_date__gte=start)
+        if end:
+            lines = lines.filter(sale__sale_date__lt=end)
+
+        # values_list + iterator: строки читаются из БД порциями, без моделей и сериализаторов
+        rows = lines.order_by('sale__sale_date', 'sale_id', 'id').values_list(
+            'sale_id', 'sale__sale_date', 'sale__buyer_name', 'product_id', 'product__name', 'quantity', 'sale_price'
+        ).iterator(chunk_size=self.chunk_size)
+        rows = ((row[0], row[1].isoformat(), *row[2:]) for row in rows)
+
+        if export_format == 'csv':
+            writer = csv.writer(_Echo())
+            stream = chain([writer.writerow(self.fields)], (writer.writerow(row) for row in rows))
+            content_type = 'text/csv; charset=utf-8'
+        else:
+            stream = (
+                json.dumps(dict(zip(self.fields, row)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                for row in rows
+            )
+            content_type = 'application/x-ndjson'
+
+        response = StreamingHttpResponse(stream, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="sales.{export_format}"'
+        return response
\ No newline at end of file